@@ -0,0 +1,37 @@
+import logging
+import time
+
+import numpy as np
+
+import utils
+
+from src.simpleWT_gym.wt_dynamics import WindTurbineSimulator
+from stair_WindTurbineSimulator import pitch_stair
+
+logging.basicConfig(level=logging.WARNING)
+
+#Compare fixed step engines against the solve_ivp RK45 reference on the pitch stair
+def run(integrator, t_end, wind):
+    env = WindTurbineSimulator(integrator=integrator)
+    states = []
+    t0 = time.perf_counter()
+    while env.ti < t_end:
+        actions = [pitch_stair(env.ti),wind]
+        states.append(env.step(actions))
+    elapsed = time.perf_counter() - t0
+    return np.array(states), elapsed
+
+def main():
+    wind = 12.3
+    t_end = 80
+
+    reference, t_ref = run("RK45", t_end, wind)
+    print("RK45 reference: {:.2f}s".format(t_ref))
+    for integrator in ["RK4", "Heun", "Euler"]:
+        states, elapsed = run(integrator, t_end, wind)
+        error = np.max(np.abs(states - reference), axis=0)
+        print("{:6s} {:.2f}s (x{:.1f})  max error w={:.2e} Ia={:.2e} pitch={:.2e}".format(
+            integrator, elapsed, t_ref/elapsed, error[0], error[1], error[2]))
+
+if __name__ == "__main__":
+    main()
@@ -20,5 +20,15 @@ def get_file_path(file_rel_path):
 def log_and_exit(myLog, id):
     # Plot Logged variables during training
     log_Path = get_file_path("../Logs/log_trains/model_"+str(id))
-    log_df = pd.DataFrame(myLog)
-    log_df.to_csv(name_date(log_Path), sep=',', encoding='utf-8')
\ No newline at end of file
+    if hasattr(myLog, "to_pandas"):
+        log_df = myLog.to_pandas()
+    else:
+        log_df = pd.DataFrame(myLog)
+    log_df.to_csv(name_date(log_Path), sep=',', encoding='utf-8')
+
+def stream_log(env, id, fmt="npz", **options):
+    # Replace env.myLog with a sink that writes chunks to disk during the run. Close it (or use it in a with block) at the end
+    from src.simpleWT_gym.log_writer import StreamingLogWriter
+    log_Path = name_date(get_file_path("../Logs/log_trains/model_"+str(id)), extension="")
+    env.myLog = StreamingLogWriter(log_Path, env.LOG_COLUMNS, fmt=fmt, **options)
+    return env.myLog
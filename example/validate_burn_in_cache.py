@@ -0,0 +1,71 @@
+import logging
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+import utils
+
+from src.simpleWT_gym.burn_in_cache import BurnInCache
+from src.simpleWT_gym.simple_wt_gym import SimpleWtGym
+from src.simpleWT_gym.simple_wt_gym_5 import SimpleWtGym5
+from src.simpleWT_gym.turbulent_wind import TurbulentWind, turbulent_wind
+from src.simpleWT_gym.wind_file import FileWind
+
+logging.basicConfig(level=logging.ERROR)
+
+#Cached burn-in against the simulated one: reset observation, Vx and the first steps must be identical.
+#Series winds (turbulent, file) bypass the cache, their Vx after reset is the series value at the burn-in end
+def presets(wind_path):
+    return {
+        "sine (gym 5)": lambda **options: SimpleWtGym5(**options),
+        "turbulent": lambda **options: SimpleWtGym(wind=TurbulentWind(0.15, seed=1), **options),
+        "file": lambda **options: SimpleWtGym(wind=FileWind(wind_path), **options),
+    }
+
+#npy record (time, speed) of 10 min of turbulent wind for FileWind
+def wind_record(path):
+    time = np.arange(0, 600, 0.05)
+    np.save(path, np.column_stack([time, turbulent_wind(18, 0.1, 600 - 0.05, 0.05, seed=2)]))
+
+def run(make_env, episodes, steps, action, **options):
+    env = make_env(**options)
+    env.enable_myLog = 0
+    np.random.seed(0)
+    trace = []
+    Vx_index = env.observations.index("Vx")
+    for episode in range(episodes):
+        obs = np.array(env.reset(), dtype=float)
+        #The observed wind is the env wind the next control step starts from
+        if obs[Vx_index] != env.Vx:
+            obs[Vx_index] = np.nan
+        trace.append(("reset", obs, env.Vx))
+        for i in range(steps):
+            obs, reward, done, info = env.step([action])
+            trace.append(("step", np.append(np.array(obs, dtype=float), reward), env.Vx))
+    return trace
+
+def compare(cached, uncached):
+    for (kind, values, Vx), (kind_ref, values_ref, Vx_ref) in zip(cached, uncached):
+        if not np.array_equal(values, values_ref) or Vx != Vx_ref:
+            return "{} differs: {} Vx={} instead of {} Vx={}".format(kind, values, Vx, values_ref, Vx_ref)
+    return None
+
+def main():
+    failed = False
+    wind_path = os.path.join(tempfile.mkdtemp(), "wind.npy")
+    wind_record(wind_path)
+    for name, make_env in presets(wind_path).items():
+        for single_call in (False, True):
+            options = {"burn_in_time": 3, "single_call": single_call}
+            #Coarse wind grid: neighbouring episodes share cache entries
+            cached = run(make_env, 3, 5, 0.3, burn_in_cache=BurnInCache(wind_tolerance=5.0), **options)
+            uncached = run(make_env, 3, 5, 0.3, **options)
+            problem = compare(cached, uncached)
+            print("{:14s} single_call={!s:5s} {}".format(name, single_call, problem or "OK"))
+            failed = failed or problem is not None
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import logging
+import sys
+
+import numpy as np
+
+import utils
+
+from src.simpleWT_gym.integrators import IMPLICIT_METHODS
+from src.simpleWT_gym.simple_wt_gym import SimpleWtGym
+from src.simpleWT_gym.simple_wt_gym_5 import SimpleWtGym5
+from src.simpleWT_gym.simple_wt_gym_9 import SimpleWtGym9
+from src.simpleWT_gym.turbulent_wind import TurbulentWind
+
+logging.basicConfig(level=logging.ERROR)
+
+#Implicit engines (analytic Jacobian) with single_call=True, where the RHS is a closure over the input:
+#time varying winds and myLog (dense output) on, against the RK45 run of the same episode
+PRESETS = {
+    "sine (gym 5)": lambda **options: SimpleWtGym5(**options),
+    "turbulent": lambda **options: SimpleWtGym(wind=TurbulentWind(0.15, seed=1), **options),
+    "random (gym 9)": lambda **options: SimpleWtGym9(**options),
+}
+RTOL = 1e-2 #solve_ivp default rtol is 1e-3 per step
+
+def run(make_env, integrator, mylog, steps=25):
+    env = make_env(integrator=integrator, single_call=True)
+    env.enable_myLog = 0
+    np.random.seed(0)
+    env.reset()
+    env.wt_sim.enable_myLog = mylog
+    for i in range(steps):
+        obs, reward, done, info = env.step([0.3])
+    return np.array(env.wt_sim.x, dtype=float)
+
+def main():
+    failed = False
+    for name, make_env in PRESETS.items():
+        for mylog in (0, 1):
+            reference = run(make_env, "RK45", mylog)
+            for integrator in IMPLICIT_METHODS:
+                try:
+                    x = run(make_env, integrator, mylog)
+                    error = np.max(np.abs(x - reference)/(np.abs(reference) + 1e-6))
+                    problem = None if error < RTOL else "max relative error {:.3g}".format(error)
+                except Exception as exception:
+                    problem = "{}: {}".format(type(exception).__name__, exception)
+                print("{:15s} myLog={} {:6s} {}".format(name, mylog, integrator, problem or "OK"))
+                failed = failed or problem is not None
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import logging
+import sys
+
+import numpy as np
+
+import utils
+
+from src.simpleWT_gym.linearization import linearize, operating_points
+from src.simpleWT_gym.wt_dynamics import WindTurbineDynamics
+
+logging.basicConfig(level=logging.WARNING)
+
+#Analytic Jacobians (wind_turbine_jacobians) against central differences of the RHS, for the analytic Cp
+#and the Cp tables: trim points of a wind grid and random states away from the trim
+MODELS = {
+    "analytic Cp": {},
+    "Cp table linear": {"cp_table": "linear"},
+    "Cp table cubic": {"cp_table": "cubic"},
+    "Cp table linear reduced": {"cp_table": "linear", "reduced_order": True},
+}
+#The fine Cp tables are close to the analytic Cp: the old analytic Jacobian of a cubic table model was off by ~3e-7
+RTOL = 5e-8
+
+def points(wt, n=200, seed=0):
+    x, u = operating_points(wt, np.linspace(12, 24, 25), w=40)
+    rng = np.random.default_rng(seed)
+    x_random = np.column_stack([rng.uniform(10, 45, n), rng.uniform(-2000, 2000, n), rng.uniform(0.05, 1.4, n), np.zeros(n)])
+    u_random = np.column_stack([rng.uniform(0.05, 1.4, n), rng.uniform(5, 24, n)])
+    return np.concatenate([x, x_random]), np.concatenate([u, u_random])
+
+#Error of each Jacobian entry relative to its largest value, median over the points (the differences are wrong
+#at the few points where they straddle a saturation kink). Largest over the entries
+def relative_errors(wt, x, u):
+    A, B, C, D = linearize(wt, x, u)
+    A_fd, B_fd, C_fd, D_fd = linearize(wt, x, u, method="fd")
+    errors = {}
+    for name, J, J_fd in (("A", A, A_fd), ("B", B, B_fd)):
+        scale = np.max(np.abs(J_fd), axis=0) + 1e-12
+        errors[name] = float(np.max(np.median(np.abs(J - J_fd), axis=0)/scale))
+    return errors
+
+def main():
+    failed = False
+    for name, options in MODELS.items():
+        wt = WindTurbineDynamics(**options)
+        x, u = points(wt)
+        errors = relative_errors(wt, x, u)
+        problem = any(error > RTOL for error in errors.values())
+        print("{:25s} {} {}".format(name, "  ".join("{} {:.2e}".format(key, error) for key, error in errors.items()), "FAILED" if problem else "OK"))
+        failed = failed or problem
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
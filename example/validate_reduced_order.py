@@ -0,0 +1,57 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+import utils
+
+from src.simpleWT_gym.integrators import FixedStepIntegrator
+from src.simpleWT_gym.wt_dynamics import WindTurbineSimulator
+from stair_WindTurbineSimulator import pitch_stair, deg2_mini_stair
+
+logging.basicConfig(level=logging.WARNING)
+
+#Reduced order model (Ia algebraic) against the full model on the stair scenarios
+SIGNALS = ["w", "Ia", "Tem", "power", "pitch", "Cp"]
+
+def run(env, schedule, t_end, wind, control_steps=1):
+    env.enable_myLog = 1
+    t0 = time.perf_counter()
+    while env.ti < t_end:
+        actions = [schedule(env.ti),wind]
+        if control_steps > 1:
+            env.step_interval(actions, control_steps)
+        else:
+            env.step(actions)
+    elapsed = time.perf_counter() - t0
+    return env.myLog.to_pandas(), elapsed
+
+def compare(full, reduced):
+    report = {}
+    for signal in SIGNALS:
+        error = np.abs(reduced[signal].to_numpy() - full[signal].to_numpy())
+        scale = np.max(np.abs(full[signal].to_numpy()))
+        report[signal] = (np.max(error), np.max(error)/scale if scale > 0 else 0.0)
+    return report
+
+def main():
+    wind = 12.3
+    t_end = 80
+
+    for schedule in [pitch_stair, deg2_mini_stair]:
+        full, t_full = run(WindTurbineSimulator(), schedule, t_end, wind)
+        cases = {
+            "reduced RK45": WindTurbineSimulator(reduced_order=True),
+            #Non-stiff: one RK4 step per 10ms
+            "reduced RK4 h=10ms": WindTurbineSimulator(integrator=FixedStepIntegrator("RK4", substeps=1), reduced_order=True),
+        }
+        print("{}: full model RK45 {:.2f}s".format(schedule.__name__, t_full))
+        for name, env in cases.items():
+            reduced, elapsed = run(env, schedule, t_end, wind)
+            print("  {} {:.2f}s (x{:.1f})".format(name, elapsed, t_full/elapsed))
+            for signal, (abs_error, rel_error) in compare(full, reduced).items():
+                print("    {:6s} max abs error {:.3e}  rel {:.2e}".format(signal, abs_error, rel_error))
+
+if __name__ == "__main__":
+    main()
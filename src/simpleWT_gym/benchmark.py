@@ -0,0 +1,224 @@
+import argparse
+import datetime
+import importlib
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .wt_dynamics import WindTurbineDynamics, WindTurbineSimulator
+
+"""
+Throughput benchmarks of the model, the simulator and the gym environments.
+    ode         WindTurbineDynamics.wind_turbine_ode calls per second
+    simulator   WindTurbineSimulator.step per integrator on a pitch stair at 12.3 m/s
+    gym         SimpleWtGym1..9.step per integrator and control mode (loop / single_call), and reset latency
+Metrics: sim_s_per_wall_s (simulated seconds per wall second), steps_per_s, rhs_per_step (integrator nfev),
+rejected_per_step, reset_ms (mean over resets of a built env, first_reset_ms builds the simulator) and
+peak_memory_kb (tracemalloc peak of a separate pass, so it does not slow down the timed one).
+Timings are the best of repeat runs. Results are saved as JSON. With --compare, throughputs more than
+tolerance below a previous JSON are reported and the exit code is 1.
+A gym case that raises is kept as a failed row (its error instead of the metrics), printed as FAILED and
+the exit code is 1.
+Usage:
+    python -m simpleWT_gym.benchmark --output Logs/bench.json
+    python -m simpleWT_gym.benchmark --suites gym --gyms 3 9 --integrators RK4 --compare Logs/bench.json
+"""
+
+SUITES = ("ode", "simulator", "gym")
+INTEGRATORS = ("RK45", "RK45-persistent", "BDF", "RK4", "RK4-jit", "Heun", "Euler", "ETD2")
+GYMS = tuple(range(1, 10))
+#Higher is better. Compared with --compare
+THROUGHPUT_METRICS = ("calls_per_s", "sim_s_per_wall_s", "steps_per_s")
+
+WIND = 12.3
+
+
+def pitch_stair(t):
+    return np.pi/8*(int(t//5) % 3)
+
+def best_time(run, repeat):
+    timings = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - t0)
+    return min(timings), result
+
+def peak_memory(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]/1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_ode(calls, repeat):
+    wt = WindTurbineDynamics()
+    x = np.array(wt.x0, dtype=float)
+    u = [0.1, WIND]
+    def run():
+        for i in range(calls):
+            wt.wind_turbine_ode(0.0, x, u)
+    elapsed, _ = best_time(run, repeat)
+    return [{"suite": "ode", "name": "wind_turbine_ode", "calls": calls, "calls_per_s": calls/elapsed, "us_per_call": elapsed/calls*1e6}]
+
+def bench_simulator(integrators, duration, repeat, memory):
+    results = []
+    for integrator in integrators:
+        def run():
+            sim = WindTurbineSimulator(integrator=integrator)
+            steps = 0
+            while sim.ti < duration:
+                sim.step([pitch_stair(sim.ti), WIND])
+                steps += 1
+            return sim, steps
+        elapsed, (sim, steps) = best_time(run, repeat)
+        stats = sim.integrator.stats
+        result = {"suite": "simulator", "name": "WindTurbineSimulator.step", "integrator": integrator, "steps": steps,
+                  "sim_s_per_wall_s": sim.ti/elapsed, "steps_per_s": steps/elapsed,
+                  "rhs_per_step": stats["nfev"]/steps, "rejected_per_step": stats["nrejected"]/steps}
+        if memory:
+            result["peak_memory_kb"] = peak_memory(run)
+        results.append(result)
+    return results
+
+def make_gym(number, integrator, single_call):
+    module = importlib.import_module("simpleWT_gym.simple_wt_gym_{}".format(number))
+    cls = getattr(module, "SimpleWtGym{}".format(number))
+    options = {"integrator": integrator, "t_max": float("inf")}
+    if number not in (1, 2, 4):
+        options["single_call"] = single_call
+    return cls(**options)
+
+def bench_gym(numbers, integrators, duration, resets, repeat, memory, mylog):
+    results = []
+    for number in numbers:
+        for integrator in integrators:
+            #Gyms 1, 2 and 4 advance one simulation step per env step: no single_call mode
+            modes = (False,) if number in (1, 2, 4) else (False, True)
+            for single_call in modes:
+                def run():
+                    np.random.seed(0)
+                    env = make_gym(number, integrator, single_call)
+                    env.enable_myLog = mylog
+                    env.reset()
+                    steps = 0
+                    while env.wt_sim.ti < duration:
+                        env.step([0.1])
+                        steps += 1
+                    return env, steps
+                try:
+                    elapsed, (env, steps) = best_time(run, repeat)
+                except Exception as error:
+                    logging.exception("SimpleWtGym{} {} failed".format(number, integrator))
+                    results.append({"suite": "gym", "name": "SimpleWtGym{}.step".format(number), "integrator": integrator,
+                                    "mode": "single_call" if single_call else "loop", "error": "{}: {}".format(type(error).__name__, error)})
+                    continue
+                stats = env.wt_sim.integrator.stats
+
+                t0 = time.perf_counter()
+                fresh = make_gym(number, integrator, single_call)
+                fresh.reset()
+                first_reset = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                for i in range(resets):
+                    fresh.reset()
+                reset_time = (time.perf_counter() - t0)/resets
+
+                result = {"suite": "gym", "name": "SimpleWtGym{}.step".format(number), "integrator": integrator,
+                          "mode": "single_call" if single_call else "loop", "steps": steps,
+                          "sim_s_per_wall_s": env.wt_sim.ti/elapsed, "steps_per_s": steps/elapsed,
+                          "rhs_per_step": stats["nfev"]/steps, "rejected_per_step": stats["nrejected"]/steps,
+                          "reset_ms": reset_time*1e3, "first_reset_ms": first_reset*1e3}
+                if memory:
+                    result["peak_memory_kb"] = peak_memory(run)
+                results.append(result)
+    return results
+
+
+def result_key(result):
+    return (result["suite"], result["name"], result.get("integrator"), result.get("mode"))
+
+#Throughput regressions of results against a previous benchmark JSON: [(key, metric, old, new)]
+def compare(results, baseline, tolerance):
+    previous = dict((result_key(result), result) for result in baseline["results"])
+    regressions = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        for metric in THROUGHPUT_METRICS:
+            if metric in result and metric in old and result[metric] < (1 - tolerance)*old[metric]:
+                regressions.append((result_key(result), metric, old[metric], result[metric]))
+    return regressions
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"date": datetime.datetime.now().isoformat(timespec="seconds"), "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "platform": platform.platform()}
+
+def print_results(results):
+    for result in results:
+        label = " ".join(str(value) for value in result_key(result)[1:] if value is not None)
+        if "error" in result:
+            print("{:45s} FAILED {}".format(label, result["error"]))
+            continue
+        metrics = "  ".join("{}={:.4g}".format(name, value) for name, value in result.items()
+                            if isinstance(value, float))
+        print("{:45s} {}".format(label, metrics))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="python -m simpleWT_gym.benchmark", description="Simulator and gym throughput benchmarks")
+    parser.add_argument("--suites", nargs="+", default=list(SUITES), choices=SUITES)
+    parser.add_argument("--integrators", nargs="+", default=list(INTEGRATORS))
+    parser.add_argument("--gyms", nargs="+", type=int, default=list(GYMS), choices=GYMS)
+    parser.add_argument("--duration", type=float, default=10.0, help="Simulated seconds per run")
+    parser.add_argument("--ode-calls", type=int, default=20000)
+    parser.add_argument("--resets", type=int, default=20, help="Resets timed per env")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--mylog", action="store_true", help="Keep the gym myLog enabled")
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--compare", help="Previous JSON results to check for throughput regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative throughput drop")
+    args = parser.parse_args(args)
+
+    results = []
+    if "ode" in args.suites:
+        results += bench_ode(args.ode_calls, args.repeat)
+    if "simulator" in args.suites:
+        results += bench_simulator(args.integrators, args.duration, args.repeat, not args.no_memory)
+    if "gym" in args.suites:
+        results += bench_gym(args.gyms, args.integrators, args.duration, args.resets, args.repeat, not args.no_memory, int(args.mylog))
+    print_results(results)
+
+    report = {"environment": environment(), "options": vars(args), "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=1)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for key, metric, old, new in regressions:
+            print("REGRESSION {} {}: {:.4g} -> {:.4g} ({:+.1%})".format(" ".join(str(value) for value in key[1:] if value is not None),
+                                                                        metric, old, new, new/old - 1))
+        if regressions:
+            return 1
+    if any("error" in result for result in results):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
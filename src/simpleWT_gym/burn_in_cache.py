@@ -0,0 +1,148 @@
+import copy
+import logging
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+"""
+Memoized burn-in for the gym environments.
+After reset the gyms simulate burn_in_time seconds with zero pitch increments. For a given env setup
+that transient only depends on the wind speed, so its final state is cached per
+(env class, burn_in_time, control setup, model config, Vx rounded to wind_tolerance) with LRU eviction.
+Wind stages without cacheable = True (TurbulentWind, BankWind, FileWind: a new series every episode) bypass
+the cache, SimpleWtGym.run_burn_in simulates their burn-in.
+On a miss the burn-in is simulated at the rounded wind speed and stored. With interpolate=True the
+simulator state and the numeric episode variables are interpolated linearly between the two cached
+wind speeds around Vx.
+A hit does not append the burn-in rows to myLog. The integral error window of gyms 8/9 is the one
+left by the cached burn-in (exact when burn_in_time covers the whole window).
+Usage:
+    env = SimpleWtGym9(burn_in_time=10, burn_in_cache=True)                 #Shared process-wide cache
+    env = SimpleWtGym9(burn_in_time=10, burn_in_cache=BurnInCache(0.05, interpolate=True))
+"""
+
+class BurnInCache():
+    def __init__(self, wind_tolerance=0.01, max_entries=256, interpolate=False):
+        self.wind_tolerance = wind_tolerance     #Wind grid [m/s]. 0 caches exact wind speeds
+        self.max_entries = max_entries
+        self.interpolate = interpolate and wind_tolerance > 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    #Burn-in of env for its current wind speed. Returns the observation after burn-in
+    def run(self, env):
+        key = env_key(env)
+        Vx = env.Vx
+        if self.wind_tolerance > 0:
+            position = Vx/self.wind_tolerance
+        else:
+            position = Vx
+
+        if self.interpolate:
+            k0 = math.floor(position)
+            weight = position - k0
+            entry0 = self.get(env, key, k0)
+            entry1 = self.get(env, key, k0 + 1) if weight > 0 else entry0
+            self.apply(env, entry0, entry1, weight)
+        else:
+            k = round(position) if self.wind_tolerance > 0 else position
+            entry = self.get(env, key, k)
+            self.apply(env, entry, entry, 0.0)
+        return env.map_outputs(env.state)
+
+    def get(self, env, key, k):
+        full_key = key + (k,)
+        if full_key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(full_key)
+            return self.entries[full_key]
+        self.misses += 1
+        wind = k*self.wind_tolerance if self.wind_tolerance > 0 else k
+        entry = self.simulate(env, wind)
+        self.entries[full_key] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    #Real burn-in at the given wind from the env reset state, then back to that reset state
+    def simulate(self, env, wind):
+        logging.debug("Burn-in cache miss. Simulating burn-in at Vx={}".format(wind))
+        start = env.get_state()
+        enable_myLog = env.enable_myLog
+        env.enable_myLog = 0
+        env.Vx = wind
+        if getattr(env, "trim_reset", False):
+            env.apply_trim()
+        while (env.wt_sim.ti < env.burn_in_time):
+            env.step([0.0, wind])
+        #Constant winds keep the Vx of the episode. A time varying wind (fixed by the stage key) ends the burn-in
+        #at its own Vx, as after an uncached burn-in
+        excluded = ("obs", "wind_stage") if env.wind_stage.time_varying else ("Vx", "obs", "wind_stage")
+        entry = {
+            "wt_sim": env.wt_sim.get_state(),
+            "env": copy.deepcopy({name: getattr(env, name) for name in env.STATE_ATTRIBUTES if name not in excluded and hasattr(env, name)}),
+        }
+        env.enable_myLog = enable_myLog
+        env.set_state(start)
+        return entry
+
+    def apply(self, env, entry0, entry1, weight):
+        sim_state = entry0["wt_sim"]
+        if weight > 0:
+            sim_state = dict(sim_state)
+            sim_state["x"] = (1 - weight)*entry0["wt_sim"]["x"] + weight*entry1["wt_sim"]["x"]
+            sim_state["outputs"] = None
+        env.wt_sim.set_state(sim_state)
+        for name, value0 in entry0["env"].items():
+            setattr(env, name, blend(value0, entry1["env"][name], weight))
+        env.state = env.wt_sim.x
+
+    def clear(self):
+        self.entries.clear()
+
+    def info(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+#Linear interpolation of numeric episode variables (integral error window...), nearest value otherwise
+def blend(value0, value1, weight):
+    if weight == 0:
+        return copy.deepcopy(value0)
+    if hasattr(value0, "interpolate"):
+        return value0.interpolate(value1, weight)
+    try:
+        array0 = np.asarray(value0, dtype=float)
+        array1 = np.asarray(value1, dtype=float)
+    except (TypeError, ValueError):
+        return copy.deepcopy(value0 if weight < 0.5 else value1)
+    if array0.shape != array1.shape:
+        return copy.deepcopy(value0 if weight < 0.5 else value1)
+    value = (1 - weight)*array0 + weight*array1
+    return value if isinstance(value0, np.ndarray) else value.tolist()
+
+
+#Everything besides the wind speed that changes the burn-in result
+def env_key(env):
+    integrator = env.integrator if isinstance(env.integrator, str) else type(env.integrator).__name__
+    config = env.wt_sim.wt.config
+    config_key = tuple((section, tuple(sorted(values.items()))) for section, values in sorted(config.items()))
+    return (type(env).__name__, env.burn_in_time, getattr(env, "control_time_step", None), getattr(env, "single_call", None),
+            getattr(env, "trim_reset", False), integrator, env.wg_nom, config_key, getattr(env, "stage_key", None))
+
+
+_DEFAULT_CACHE = None
+
+#burn_in_cache argument of the gyms: None/False (no cache), True (process-wide cache) or a BurnInCache
+def get_burn_in_cache(burn_in_cache):
+    global _DEFAULT_CACHE
+    if burn_in_cache is True:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = BurnInCache()
+        return _DEFAULT_CACHE
+    if not burn_in_cache:
+        return None
+    return burn_in_cache
@@ -0,0 +1,143 @@
+import logging
+
+import numpy as np
+
+from .integrators import FixedStepIntegrator
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+"""
+Fused wind turbine RHS and fixed-step integration loop, compiled with numba when it is installed.
+fused_rhs is wind_turbine_ode written as one function of scalars (or arrays) and a parameter vector: no method
+calls, lists or np.clip on scalars. fused_steps runs n Euler, Heun or RK4 steps of it with a constant input.
+    numba       integrate_kernel loops over the turbines and the steps in one njit(nogil=True) kernel, so several
+                simulators can run in parallel threads. Compiled on first use and cached in __pycache__
+    no numba    the same functions run as NumPy array operations over all the turbines at once (on floats for one)
+CompiledIntegrator is the engine ("RK4-jit", "Heun-jit", "Euler-jit" in make_integrator). It takes the kernel for
+the model RHS with a constant input, for one turbine (4,) or a batch (N,4), and the FixedStepIntegrator path for
+anything else (time varying input, Cp table). Results match FixedStepIntegrator up to rounding.
+"""
+
+NUMBA_AVAILABLE = numba is not None
+
+#fused_steps methods
+EULER, HEUN, RK4 = 0, 1, 2
+METHODS = {"EULER": EULER, "HEUN": HEUN, "RK4": RK4}
+
+#Parameter vector layout
+(C1, C2, C3, C4, C5, C6, C7, C8, C9, R, HALF_RHO_A, KF, INV_J, KGKPHI, INV_LA, R_LA, INV_R, INV_TAO, MAX_DPITCH,
+ REDUCED_ORDER) = range(20)
+
+
+def jit(function):
+    if NUMBA_AVAILABLE:
+        return numba.njit(nogil=True, cache=True)(function)
+    return function
+
+#Parameter vector of a WindTurbineDynamics for the kernels
+def kernel_parameters(wt):
+    rotor = wt.rotor
+    return np.array([wt.c1, wt.c2, wt.c3, wt.c4, wt.c5, wt.c6, wt.c7, wt.c8, wt.c9, wt.R, wt.half_rho_A,
+                     rotor.Kf, rotor.inv_J, rotor.KgKphi, rotor.inv_La, rotor.R_La, rotor.inv_R, 1/wt.tao_pitch, wt.max_dpitch,
+                     float(wt.reduced_order)], dtype=float)
+
+
+#wind_turbine_ode of WindTurbineDynamics (analytic Cp). Returns dxdt as a tuple (dwdt, dIadt, dpitchdt, d2pitchd2t)
+@jit
+def fused_rhs(w, Ia, pitch, pitch_ref, wind_speed, p):
+    #Saturations of the Simulink model
+    w_sat = np.minimum(np.maximum(w, 2.5), 50.0)
+    pitch = np.minimum(np.maximum(pitch, 0.0), np.pi/2)
+    wind_speed = np.minimum(np.maximum(wind_speed, 1.8), 25.0)
+
+    tip_speed_ratio = w_sat*p[R]/wind_speed
+    dpitchdt = np.minimum(np.maximum(p[INV_TAO]*(pitch_ref - pitch), -p[MAX_DPITCH]), p[MAX_DPITCH])
+
+    lambda_i = (1/(tip_speed_ratio + p[C8]) - (p[C9]/(pitch**3 + 1)))**(-1)
+    Cp = p[C1]*(p[C2]/lambda_i - p[C3]*pitch - p[C4]*(pitch**p[C5]) - p[C6])*np.exp(-(p[C7]/lambda_i))
+    Cp = np.minimum(np.maximum(Cp, 0.0), 1.0)
+    Tm = Cp*p[HALF_RHO_A]*wind_speed**3/w_sat
+
+    Ea = p[KGKPHI]*w_sat
+    if p[REDUCED_ORDER]:
+        Ia = Ea*p[INV_R]
+    Tem = p[KGKPHI]*Ia
+    dwdt = (Tm - Tem - p[KF]*w_sat)*p[INV_J]
+    if p[REDUCED_ORDER]:
+        dIadt = p[KGKPHI]*dwdt*p[INV_R]*(w_sat == w)
+    else:
+        dIadt = Ea*p[INV_LA] - p[R_LA]*Ia
+    return dwdt, dIadt, dpitchdt, 0.0
+
+#n steps of size h with a constant input. Same stage arithmetic as euler_step/heun_step/rk4_step
+@jit
+def fused_steps(w, Ia, pitch, dpitch, pitch_ref, wind_speed, h, n, method, p):
+    for k in range(n):
+        k1w, k1i, k1p, k1d = fused_rhs(w, Ia, pitch, pitch_ref, wind_speed, p)
+        if method == EULER:
+            w, Ia, pitch, dpitch = w + h*k1w, Ia + h*k1i, pitch + h*k1p, dpitch + h*k1d
+        elif method == HEUN:
+            k2w, k2i, k2p, k2d = fused_rhs(w + h*k1w, Ia + h*k1i, pitch + h*k1p, pitch_ref, wind_speed, p)
+            w, Ia, pitch, dpitch = (w + 0.5*h*(k1w + k2w), Ia + 0.5*h*(k1i + k2i),
+                                    pitch + 0.5*h*(k1p + k2p), dpitch + 0.5*h*(k1d + k2d))
+        else:
+            k2w, k2i, k2p, k2d = fused_rhs(w + 0.5*h*k1w, Ia + 0.5*h*k1i, pitch + 0.5*h*k1p, pitch_ref, wind_speed, p)
+            k3w, k3i, k3p, k3d = fused_rhs(w + 0.5*h*k2w, Ia + 0.5*h*k2i, pitch + 0.5*h*k2p, pitch_ref, wind_speed, p)
+            k4w, k4i, k4p, k4d = fused_rhs(w + h*k3w, Ia + h*k3i, pitch + h*k3p, pitch_ref, wind_speed, p)
+            w, Ia, pitch, dpitch = (w + h/6*(k1w + 2*k2w + 2*k3w + k4w), Ia + h/6*(k1i + 2*k2i + 2*k3i + k4i),
+                                    pitch + h/6*(k1p + 2*k2p + 2*k3p + k4p), dpitch + h/6*(k1d + 2*k2d + 2*k3d + k4d))
+    return w, Ia, pitch, dpitch
+
+#States (N,4) after n steps from x (N,4) with the inputs u (N,2). One compiled loop over turbines and steps
+@jit
+def _integrate_loop(x, u, h, n, method, p):
+    out = np.empty_like(x)
+    for i in range(x.shape[0]):
+        out[i,0], out[i,1], out[i,2], out[i,3] = fused_steps(x[i,0], x[i,1], x[i,2], x[i,3], u[i,0], u[i,1], h, n, method, p)
+    return out
+
+#NumPy fallback: the steps run on whole columns, or on Python floats for a single turbine
+#(NumPy calls on 1 element arrays cost more than the arithmetic)
+def _integrate_columns(x, u, h, n, method, p):
+    out = np.empty_like(x)
+    if len(x) == 1:
+        out[0] = fused_steps(*x[0].tolist(), *u[0].tolist(), h, n, method, p.tolist())
+        return out
+    w, Ia, pitch, dpitch = fused_steps(x[:,0], x[:,1], x[:,2], x[:,3], u[:,0], u[:,1], h, n, method, p)
+    out[:,0] = w
+    out[:,1] = Ia
+    out[:,2] = pitch
+    out[:,3] = dpitch
+    return out
+
+integrate_kernel = _integrate_loop if NUMBA_AVAILABLE else _integrate_columns
+
+
+class CompiledIntegrator(FixedStepIntegrator):
+    #model: WindTurbineDynamics (or BatchWindTurbineDynamics) whose wind_turbine_ode is replaced by the kernel
+    def __init__(self, method='RK4', dt=0.01, substeps=None, model=None):
+        super().__init__(method, dt=dt, substeps=substeps)
+        self.kernel_method = METHODS[self.method]
+        self.model = model
+        self.parameters = None
+        if model is not None and getattr(model, "cp_table", None) is None:
+            self.parameters = kernel_parameters(model)
+        elif model is not None:
+            logging.info("Cp table model: {}-jit uses the Python RHS".format(method))
+        if not NUMBA_AVAILABLE:
+            logging.info("numba not installed: {}-jit runs the NumPy version of the fused kernel".format(method))
+
+    def integrate(self, fun, t0, tf, x, args=(), jac=None):
+        if self.parameters is None or len(args) != 1 or callable(args[0]) or fun != self.model.wind_turbine_ode:
+            return super().integrate(fun, t0, tf, x, args)
+        x = np.asarray(x, dtype=float)
+        states = x.reshape(-1, 4)
+        u = np.broadcast_to(np.asarray(args[0], dtype=float), (len(states), 2))
+        n = max(1, int(np.ceil((tf-t0)/self.h_max - 1e-9)))
+        h = (tf-t0)/n
+        states = integrate_kernel(np.ascontiguousarray(states), np.ascontiguousarray(u), h, n, self.kernel_method, self.parameters)
+        self.record_stats(n*self.stages, n, 0)
+        return states.reshape(x.shape)
@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+
+import numpy as np
+from scipy.interpolate import RectBivariateSpline
+
+"""
+Tabulated Cp(tip_speed_ratio, pitch) surface.
+Built once per Cp coefficient set (c1..c9) and grid from the analytic lambda_i/c_p of WindTurbineDynamics.
+Tables are cached in memory and, when cache_dir is given, on disk as .npz.
+Evaluation is bilinear (default) or bicubic, for scalars or arrays. gradient() gives the partial derivatives
+of the interpolant itself (the Jacobian of a table model), zero outside the grid and where Cp is clipped.
+"""
+
+_CP_TABLES = {}
+
+
+class CpTable():
+    def __init__(self, wt, lambda_range=None, pitch_range=(0.0, np.pi/2), n_lambda=1024, n_pitch=256, method="linear", table=None):
+        if lambda_range is None:
+            lambda_range = default_lambda_range(wt)
+        self.wt = wt
+        self.method = method
+        self.lambdas = np.linspace(lambda_range[0], lambda_range[1], n_lambda)
+        self.pitches = np.linspace(pitch_range[0], pitch_range[1], n_pitch)
+        if table is None:
+            table = wt.c_p(wt.lambda_i(self.lambdas[:,None], self.pitches[None,:]), self.pitches[None,:])
+        self.table = np.ascontiguousarray(table, dtype=float)
+
+        #Grid constants for the interpolation
+        self.lambda0 = float(self.lambdas[0])
+        self.pitch0 = float(self.pitches[0])
+        self.inv_dlambda = float((n_lambda - 1)/(self.lambdas[-1] - self.lambdas[0]))
+        self.inv_dpitch = float((n_pitch - 1)/(self.pitches[-1] - self.pitches[0]))
+        self.rows = self.table.tolist()     #Python lists are faster than numpy indexing for scalars
+        #Upper index limits keeping i+1, j+1 inside the table
+        self.x_max = (n_lambda - 1) - 1e-9
+        self.y_max = (n_pitch - 1) - 1e-9
+        if method == "cubic":
+            self.spline = RectBivariateSpline(self.lambdas, self.pitches, self.table, kx=3, ky=3)
+        elif method != "linear":
+            raise ValueError("Unknown Cp table method: {}".format(method))
+
+    def __call__(self, tip_speed_ratio, pitch):
+        if self.method == "cubic":
+            Cp = self.spline.ev(tip_speed_ratio, pitch)
+            return np.clip(Cp, 0.0, 1.0)
+        if isinstance(tip_speed_ratio, float) and isinstance(pitch, float):
+            #Python floats and numpy float64 scalars
+            return self.bilinear_scalar(tip_speed_ratio, pitch)
+        return self.bilinear(tip_speed_ratio, pitch)
+
+    def bilinear(self, tip_speed_ratio, pitch):
+        n_lambda, n_pitch = self.table.shape
+        x = np.clip((np.asarray(tip_speed_ratio) - self.lambda0)*self.inv_dlambda, 0, n_lambda - 1)
+        y = np.clip((np.asarray(pitch) - self.pitch0)*self.inv_dpitch, 0, n_pitch - 1)
+        i = np.minimum(x.astype(int), n_lambda - 2)
+        j = np.minimum(y.astype(int), n_pitch - 2)
+        fx = x - i
+        fy = y - j
+        t = self.table
+        return (t[i,j]*(1 - fx) + t[i+1,j]*fx)*(1 - fy) + (t[i,j+1]*(1 - fx) + t[i+1,j+1]*fx)*fy
+
+    #(Cp, dCp/dtip_speed_ratio, dCp/dpitch) of the interpolant. Arrays of any matching shape
+    def gradient(self, tip_speed_ratio, pitch):
+        tip_speed_ratio = np.asarray(tip_speed_ratio, dtype=float)
+        pitch = np.asarray(pitch, dtype=float)
+        n_lambda, n_pitch = self.table.shape
+        x_raw = (tip_speed_ratio - self.lambda0)*self.inv_dlambda
+        y_raw = (pitch - self.pitch0)*self.inv_dpitch
+        #The interpolant is constant in the clamped direction outside the grid
+        x_in = ((x_raw >= 0) & (x_raw <= n_lambda - 1)).astype(float)
+        y_in = ((y_raw >= 0) & (y_raw <= n_pitch - 1)).astype(float)
+        if self.method == "cubic":
+            tip_speed_ratio = np.clip(tip_speed_ratio, self.lambdas[0], self.lambdas[-1])
+            pitch = np.clip(pitch, self.pitches[0], self.pitches[-1])
+            Cp_raw = self.spline.ev(tip_speed_ratio, pitch)
+            dCp_sat = ((Cp_raw >= 0.0) & (Cp_raw <= 1.0)).astype(float)
+            dCp_dlambda = dCp_sat*x_in*self.spline.ev(tip_speed_ratio, pitch, dx=1)
+            dCp_dpitch = dCp_sat*y_in*self.spline.ev(tip_speed_ratio, pitch, dy=1)
+            return np.clip(Cp_raw, 0.0, 1.0), dCp_dlambda, dCp_dpitch
+        x = np.clip(x_raw, 0, n_lambda - 1)
+        y = np.clip(y_raw, 0, n_pitch - 1)
+        i = np.minimum(x.astype(int), n_lambda - 2)
+        j = np.minimum(y.astype(int), n_pitch - 2)
+        fx = x - i
+        fy = y - j
+        t = self.table
+        Cp = (t[i,j]*(1 - fx) + t[i+1,j]*fx)*(1 - fy) + (t[i,j+1]*(1 - fx) + t[i+1,j+1]*fx)*fy
+        dCp_dlambda = x_in*((t[i+1,j] - t[i,j])*(1 - fy) + (t[i+1,j+1] - t[i,j+1])*fy)*self.inv_dlambda
+        dCp_dpitch = y_in*((t[i,j+1] - t[i,j])*(1 - fx) + (t[i+1,j+1] - t[i+1,j])*fx)*self.inv_dpitch
+        return Cp, dCp_dlambda, dCp_dpitch
+
+    def bilinear_scalar(self, tip_speed_ratio, pitch):
+        x = (float(tip_speed_ratio) - self.lambda0)*self.inv_dlambda
+        y = (float(pitch) - self.pitch0)*self.inv_dpitch
+        if x < 0.0:
+            x = 0.0
+        elif x > self.x_max:
+            x = self.x_max
+        if y < 0.0:
+            y = 0.0
+        elif y > self.y_max:
+            y = self.y_max
+        i = int(x)
+        j = int(y)
+        fx = x - i
+        fy = y - j
+        row0 = self.rows[i]
+        row1 = self.rows[i+1]
+        return (row0[j]*(1 - fx) + row1[j]*fx)*(1 - fy) + (row0[j+1]*(1 - fx) + row1[j+1]*fx)*fy
+
+    #Interpolation error against the analytic c_p on random off-grid points
+    def error_report(self, n=200000, seed=0):
+        rng = np.random.default_rng(seed)
+        tip_speed_ratio = rng.uniform(self.lambdas[0], self.lambdas[-1], n)
+        pitch = rng.uniform(self.pitches[0], self.pitches[-1], n)
+        exact = self.wt.c_p(self.wt.lambda_i(tip_speed_ratio, pitch), pitch)
+        error = np.abs(self(tip_speed_ratio, pitch) - exact)
+        k = np.argmax(error)
+        return {
+            "method": self.method,
+            "max_abs": float(error[k]),
+            "rms": float(np.sqrt(np.mean(error**2))),
+            "max_at_lambda": float(tip_speed_ratio[k]),
+            "max_at_pitch": float(pitch[k]),
+        }
+
+
+#Tip speed ratio range reachable with the model saturations (w in [2.5,50], wind in [1.8,25])
+def default_lambda_range(wt):
+    return (wt.tip_speed_ratio(25, 2.5), wt.tip_speed_ratio(1.8, 50))
+
+def cp_coefficients(wt):
+    return (wt.c1, wt.c2, wt.c3, wt.c4, wt.c5, wt.c6, wt.c7, wt.c8, wt.c9)
+
+
+#Cached table for the coefficients of wt. Memory cache first, then cache_dir, then build
+def get_cp_table(wt, method="linear", n_lambda=1024, n_pitch=256, cache_dir=None):
+    lambda_range = default_lambda_range(wt)
+    key = cp_coefficients(wt) + tuple(lambda_range) + (n_lambda, n_pitch)
+    if (key, method) in _CP_TABLES:
+        return _CP_TABLES[(key, method)]
+
+    table = None
+    file_path = None
+    if cache_dir is not None:
+        file_path = os.path.join(cache_dir, "cp_table_{}.npz".format(hashlib.sha1(repr(key).encode()).hexdigest()[:16]))
+        if os.path.exists(file_path):
+            logging.info("Loading Cp table from {}".format(file_path))
+            table = np.load(file_path)["table"]
+
+    cp_table = CpTable(wt, lambda_range, n_lambda=n_lambda, n_pitch=n_pitch, method=method, table=table)
+    if file_path is not None and table is None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(file_path, table=cp_table.table, lambdas=cp_table.lambdas, pitches=cp_table.pitches, coefficients=np.array(cp_coefficients(wt)))
+    logging.info("Cp table built: {}".format(cp_table.error_report(n=20000)))
+    _CP_TABLES[(key, method)] = cp_table
+    return cp_table
@@ -0,0 +1,24 @@
+import copy
+
+import numpy as np
+
+"""
+Episode snapshots for the gym environments (get_state/set_state).
+A snapshot holds the simulator state (x, ti, pitch_ref), the env episode variables listed in the
+env STATE_ATTRIBUTES (wind, observation, integral error window...) and the np.random state.
+"""
+
+def get_env_state(env, attributes):
+    return {
+        "wt_sim": env.wt_sim.get_state(),
+        "env": copy.deepcopy({name: getattr(env, name) for name in attributes if hasattr(env, name)}),
+        "np_random": np.random.get_state(),
+    }
+
+def set_env_state(env, state):
+    if env.wt_sim is None:
+        env.init_simulator()
+    env.wt_sim.set_state(state["wt_sim"])
+    for name, value in copy.deepcopy(state["env"]).items():
+        setattr(env, name, value)
+    np.random.set_state(state["np_random"])
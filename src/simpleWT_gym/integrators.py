@@ -0,0 +1,324 @@
+import logging
+
+import numpy as np
+from scipy.integrate import solve_ivp, RK23, RK45, DOP853
+from scipy.sparse import bsr_matrix
+
+"""
+Integration engines for WindTurbineSimulator.
+Every engine exposes integrate(fun, t0, tf, x, args, jac) and returns the state at tf.
+integrate_dense(fun, t0, tf, x, t_eval, args, jac) also returns the states at the sample times t_eval.
+fun follows the solve_ivp signature fun(t, x, *args). x can have any shape.
+jac(t, x, *args) replaces the Jacobian of the engine for one call (a fun closing over a time varying input
+needs a jac closing over the same input). Engines without Jacobian ignore it.
+Solver statistics (nfev, naccepted, nrejected) of the last call are in last_stats, accumulated ones in stats.
+"""
+
+SOLVE_IVP_METHODS = ("RK45", "RK23", "DOP853", "Radau", "BDF", "LSODA")
+#Implicit methods get the analytic Jacobian of the model
+IMPLICIT_METHODS = ("Radau", "BDF", "LSODA")
+#Default substeps per simulator dt. Ia time constant is ~1.6ms, explicit methods need h below ~3ms to stay stable
+FIXED_STEP_SUBSTEPS = {"RK4": 4, "HEUN": 4, "EULER": 8}
+#RHS evaluations per step attempt of the explicit RK methods. Used to count rejected steps
+RK_STAGES = {"RK45": 6, "RK23": 3}
+PERSISTENT_SOLVERS = {"RK45": RK45, "RK23": RK23, "DOP853": DOP853}
+
+
+class Integrator():
+    def __init__(self):
+        self.stats = {"nfev": 0, "naccepted": 0, "nrejected": 0}
+        self.last_stats = dict(self.stats)
+
+    #Drop any solver state carried between steps (stateless engines have none)
+    def reset(self):
+        pass
+
+    def record_stats(self, nfev, naccepted, nrejected):
+        self.last_stats = {"nfev": nfev, "naccepted": naccepted, "nrejected": nrejected}
+        for key, value in self.last_stats.items():
+            self.stats[key] += value
+
+
+#Reference engine. One solve_ivp call per integrate()
+class SolveIvpIntegrator(Integrator):
+    def __init__(self, method='RK45', **options):
+        super().__init__()
+        self.method = method
+        self.options = options
+
+    def integrate(self, fun, t0, tf, x, args=(), jac=None):
+        x = np.asarray(x, dtype=float)
+        solution = self.solve(fun, t0, tf, x, args, jac)
+        return solution.y[:,-1].reshape(x.shape)
+
+    #Single call over [t0,tf]. Samples at t_eval come from the dense output interpolant
+    def integrate_dense(self, fun, t0, tf, x, t_eval, args=(), jac=None):
+        x = np.asarray(x, dtype=float)
+        solution = self.solve(fun, t0, tf, x, args, jac, dense_output=True)
+        samples = solution.sol(t_eval).T.reshape((len(t_eval),) + x.shape)
+        return solution.y[:,-1].reshape(x.shape), samples
+
+    def solve(self, fun, t0, tf, x, args, jac=None, **kwargs):
+        options = self.options
+        if jac is not None and "jac" in options:
+            options = dict(options, jac=jac)
+        if x.ndim > 1:
+            #solve_ivp only handles 1-D states
+            fun = _flat_fun(fun, x.shape)
+            if "jac" in options:
+                options = dict(options, jac=_flat_jac(options["jac"], x.shape))
+        solution = solve_ivp(fun, [t0,tf], x.ravel(), method=self.method, args=args, **options, **kwargs)
+        logging.debug("Solver finished with success: {}".format(solution.success))
+        if solution.success==False:
+            logging.error("Solver failed. Stopping simulation.")
+
+        naccepted = len(solution.t) - 1
+        nrejected = 0
+        if self.method in RK_STAGES:
+            #f(t0) and the initial step selection, then n_stages evaluations per attempt
+            init_evals = 1 if "first_step" in self.options else 2
+            nrejected = max(0, (solution.nfev - init_evals)//RK_STAGES[self.method] - naccepted)
+        self.record_stats(solution.nfev, naccepted, nrejected)
+        return solution
+
+
+#Explicit fixed-step engine. Splits [t0,tf] in equal substeps not larger than dt/substeps
+class FixedStepIntegrator(Integrator):
+    def __init__(self, method='RK4', dt=0.01, substeps=None):
+        super().__init__()
+        self.method = method.upper()
+        if self.method not in FIXED_STEP_SUBSTEPS:
+            raise ValueError("Unknown fixed step method: {}".format(method))
+        if substeps is None:
+            substeps = FIXED_STEP_SUBSTEPS[self.method]
+        self.substeps = substeps
+        self.h_max = dt/substeps
+        self.step_fn = {"RK4": rk4_step, "HEUN": heun_step, "EULER": euler_step}[self.method]
+        self.stages = {"RK4": 4, "HEUN": 2, "EULER": 1}[self.method]
+
+    def integrate(self, fun, t0, tf, x, args=(), jac=None):
+        n = max(1, int(np.ceil((tf-t0)/self.h_max - 1e-9)))
+        h = (tf-t0)/n
+        x = np.array(x, dtype=float)
+        for i in range(n):
+            x = self.step_fn(fun, t0 + i*h, x, h, args)
+        self.record_stats(n*self.stages, n, 0)
+        return x
+
+    #Fixed step engines have no interpolant. Integrate segment by segment between the sample times
+    def integrate_dense(self, fun, t0, tf, x, t_eval, args=(), jac=None):
+        samples = []
+        t = t0
+        nfev = 0
+        naccepted = 0
+        for te in t_eval:
+            if te > t:
+                x = self.integrate(fun, t, te, x, args)
+                nfev += self.last_stats["nfev"]
+                naccepted += self.last_stats["naccepted"]
+                t = te
+            samples.append(x)
+        if tf > t:
+            x = self.integrate(fun, t, tf, x, args)
+            nfev += self.last_stats["nfev"]
+            naccepted += self.last_stats["naccepted"]
+        self.last_stats = {"nfev": nfev, "naccepted": naccepted, "nrejected": 0}
+        return x, np.array(samples)
+
+
+"""
+Exponential time differencing engine (ETD2RK, Cox-Matthews) for x' = L*x + N(x) with a diagonal L.
+The stiff linear part (armature current decay) is integrated exactly, so the step is set by the slow
+dynamics only. Default is one step per simulator dt, 2 RHS evaluations per step.
+"""
+class ExponentialIntegrator(FixedStepIntegrator):
+    def __init__(self, linear, dt=0.01, substeps=1):
+        Integrator.__init__(self)
+        self.method = "ETD2"
+        self.linear = np.asarray(linear, dtype=float)
+        self.substeps = substeps
+        self.h_max = dt/substeps
+        self.stages = 2
+        self.h = None
+
+    #phi functions of z = L*h, with the series expansion where L is ~0
+    def coefficients(self, h):
+        if h != self.h:
+            z = self.linear*h
+            small = np.abs(z) < 1e-6
+            z_safe = np.where(small, 1.0, z)
+            self.ez = np.exp(z)
+            self.phi1 = np.where(small, 1 + z/2, (self.ez - 1)/z_safe)
+            self.phi2 = np.where(small, 0.5 + z/6, (self.ez - 1 - z)/z_safe**2)
+            self.h = h
+        return self.ez, self.phi1, self.phi2
+
+    def step_fn(self, fun, t, x, h, args):
+        ez, phi1, phi2 = self.coefficients(h)
+        L = self.linear
+        N = np.asarray(fun(t, x, *args)) - L*x
+        a = ez*x + h*phi1*N
+        Na = np.asarray(fun(t + h, a, *args)) - L*a
+        return a + h*phi2*(Na - N)
+
+
+"""
+Continuous stepping engine. Keeps one long-lived scipy OdeSolver across integrate() calls.
+The solver steps freely past tf and the state at tf comes from its dense output, so one
+solver step can serve several simulator steps and the step size is never re-estimated.
+The solver is restarted (warm, with the last step size) only when the input changes by more
+than reset_tol, the state is modified outside the engine or the time does not continue.
+"""
+class PersistentIntegrator(Integrator):
+    def __init__(self, method='RK45', reset_tol=0.0, **options):
+        super().__init__()
+        if method not in PERSISTENT_SOLVERS:
+            raise ValueError("Unknown persistent method: {}".format(method))
+        self.method = method
+        self.reset_tol = reset_tol
+        self.options = options
+        self.stats["nresets"] = 0
+        self.reset()
+
+    #Forget the solver. Next integrate() starts again (still with the last step size)
+    def reset(self):
+        self.solver = None
+        self.interpolant = None
+        self.t_out = None
+        self.x_out = None
+        self.u = None
+
+    def integrate(self, fun, t0, tf, x, args=(), jac=None):
+        nfev_init = 0
+        if not self.continues(fun, t0, x, args):
+            self.restart(fun, t0, x, args)
+            nfev_init = self.solver.nfev
+        solver = self.solver
+        nfev0 = solver.nfev
+        naccepted = 0
+        nrejected = 0
+        while solver.t < tf:
+            nfev_step = solver.nfev
+            message = solver.step()
+            if solver.status == 'failed':
+                logging.error("Solver failed. Stopping simulation. {}".format(message))
+                break
+            naccepted += 1
+            if self.method in RK_STAGES:
+                nrejected += (solver.nfev - nfev_step)//RK_STAGES[self.method] - 1
+            self.interpolant = None
+
+        if solver.t == tf:
+            y = solver.y.copy()
+        else:
+            if self.interpolant is None:
+                self.interpolant = solver.dense_output()
+            y = self.interpolant(tf)
+        self.record_stats(nfev_init + solver.nfev - nfev0, naccepted, nrejected)
+
+        self.t_out = tf
+        self.x_out = y.reshape(self.shape)
+        return self.x_out
+
+    def integrate_dense(self, fun, t0, tf, x, t_eval, args=(), jac=None):
+        samples = []
+        nfev = 0
+        naccepted = 0
+        nrejected = 0
+        for te in t_eval:
+            x = self.integrate(fun, t0, te, x, args)
+            t0 = te
+            nfev += self.last_stats["nfev"]
+            naccepted += self.last_stats["naccepted"]
+            nrejected += self.last_stats["nrejected"]
+            samples.append(x)
+        if tf > t0:
+            x = self.integrate(fun, t0, tf, x, args)
+            nfev += self.last_stats["nfev"]
+            naccepted += self.last_stats["naccepted"]
+            nrejected += self.last_stats["nrejected"]
+        self.last_stats = {"nfev": nfev, "naccepted": naccepted, "nrejected": nrejected}
+        return x, np.array(samples)
+
+    def continues(self, fun, t0, x, args):
+        if self.solver is None or t0 != self.t_out or fun != self.fun:
+            return False
+        if x is not self.x_out and not np.array_equal(x, self.x_out):
+            return False
+        u = _args_array(args)
+        if u.shape != self.u.shape or np.any(np.abs(u - self.u) > self.reset_tol):
+            return False
+        return True
+
+    def restart(self, fun, t0, x, args):
+        x = np.asarray(x, dtype=float)
+        self.shape = x.shape
+        self.fun = fun
+        self.u = _args_array(args)
+        first_step = None
+        if self.solver is not None:
+            #Warm start with the last step size
+            first_step = self.solver.h_abs
+            self.stats["nresets"] += 1
+        ode = _flat_fun(fun, self.shape)
+        self.solver = PERSISTENT_SOLVERS[self.method](lambda t, y: ode(t, y, *args), t0, x.ravel(), np.inf, first_step=first_step, **self.options)
+        self.interpolant = None
+
+
+def euler_step(fun, t, x, h, args):
+    k1 = np.asarray(fun(t, x, *args))
+    return x + h*k1
+
+def heun_step(fun, t, x, h, args):
+    k1 = np.asarray(fun(t, x, *args))
+    k2 = np.asarray(fun(t + h, x + h*k1, *args))
+    return x + 0.5*h*(k1 + k2)
+
+def rk4_step(fun, t, x, h, args):
+    k1 = np.asarray(fun(t, x, *args))
+    k2 = np.asarray(fun(t + 0.5*h, x + 0.5*h*k1, *args))
+    k3 = np.asarray(fun(t + 0.5*h, x + 0.5*h*k2, *args))
+    k4 = np.asarray(fun(t + h, x + h*k3, *args))
+    return x + h/6*(k1 + 2*k2 + 2*k3 + k4)
+
+
+def _flat_fun(fun, shape):
+    def flat_fun(t, y, *args):
+        return np.asarray(fun(t, y.reshape(shape), *args)).ravel()
+    return flat_fun
+
+#Block diagonal Jacobian of a batch of independent systems
+def _flat_jac(jac, shape):
+    n = int(np.prod(shape[:-1]))
+    indices = np.arange(n)
+    indptr = np.arange(n + 1)
+    def flat_jac(t, y, *args):
+        blocks = np.asarray(jac(t, y.reshape(shape), *args)).reshape(n, shape[-1], shape[-1])
+        return bsr_matrix((blocks, indices, indptr), shape=(y.size, y.size))
+    return flat_jac
+
+def _args_array(args):
+    return np.concatenate([np.ravel(np.asarray(arg, dtype=float)) for arg in args]) if args else np.zeros(0)
+
+
+#Build an engine from its name ("RK45", "RK4", "Heun", "Euler", "BDF", "ETD2", "RK45-persistent", "RK4-jit", ...). Engine instances are returned unchanged
+#model provides the analytic Jacobian (wind_turbine_jac) and the stiff linear part (linear_part) when the engine needs them
+def make_integrator(integrator="RK45", dt=0.01, model=None, **options):
+    if hasattr(integrator, "integrate"):
+        return integrator
+    if integrator in IMPLICIT_METHODS and model is not None:
+        options.setdefault("jac", model.wind_turbine_jac)
+    if integrator in SOLVE_IVP_METHODS:
+        return SolveIvpIntegrator(integrator, **options)
+    if integrator == "ETD2":
+        if model is None:
+            raise ValueError("ETD2 integrator needs the model linear part")
+        return ExponentialIntegrator(model.linear_part(), dt=dt, **options)
+    if integrator.upper() in FIXED_STEP_SUBSTEPS:
+        return FixedStepIntegrator(integrator, dt=dt, **options)
+    if integrator.endswith("-jit"):
+        from .compiled_dynamics import CompiledIntegrator
+        return CompiledIntegrator(integrator[:-len("-jit")].upper(), dt=dt, model=model, **options)
+    if integrator.endswith("-persistent"):
+        return PersistentIntegrator(integrator[:-len("-persistent")], **options)
+    raise ValueError("Unknown integrator: {}".format(integrator))
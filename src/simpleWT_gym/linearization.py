@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import os
+
+import numpy as np
+
+from .wt_dynamics_batch import BatchWindTurbineDynamics
+
+"""
+Linear models of wind_turbine_ode around operating points.
+    dx = A dx + B du        x = [w, Ia, pitch, dpitch], u = [pitch_ref, wind]
+    dy = C dx + D du        y = OUTPUTS
+All operating points are linearized in one vectorized pass, analytically (wind_turbine_jacobians) or by
+batched central differences of the batched RHS (method="fd", mainly to check the analytic one).
+Complex step is not used: the Simulink saturations (np.clip) of the model are not complex-safe.
+A gain schedule is the table of linear models at the trim points of a wind grid. It is cached in memory and,
+with cache_dir, on disk as .npz.
+"""
+
+OUTPUTS = ("w", "pitch", "Tem", "power")
+
+_GAIN_SCHEDULES = {}
+
+
+#Operating points (x, u) at the equilibrium for each wind. pitch: fixed pitch, or w: pitch holding that speed
+def operating_points(wt, wind, pitch=0.0, w=None):
+    wind = np.asarray(wind, dtype=float)
+    if w is not None:
+        pitch = wt.trim_pitch(wind, w, saturate=True)
+    wind, pitch = np.broadcast_arrays(wind, np.asarray(pitch, dtype=float))
+    x = wt.trim(wind, pitch)
+    u = np.stack([pitch, wind], axis=-1)
+    return x, u
+
+#A (...,4,4), B (...,4,2), C (...,4,4), D (...,4,2) at arrays of states x (...,4) and inputs u (...,2)
+def linearize(wt, x, u, method="analytic", eps=1e-6):
+    x = np.asarray(x, dtype=float)
+    u = np.asarray(u, dtype=float)
+    if method == "analytic":
+        A, B = wt.wind_turbine_jacobians(0.0, x, u)
+    elif method == "fd":
+        A, B = finite_difference_jacobians(wt, x, u, eps)
+    else:
+        raise ValueError("Unknown linearization method: {}".format(method))
+    C, D = output_jacobians(wt, x, u)
+    return A, B, C, D
+
+#Central differences of the batched RHS. 12 batched evaluations whatever the number of points
+def finite_difference_jacobians(wt, x, u, eps=1e-6):
+    shape = x.shape[:-1]
+    x = x.reshape(-1, 4)
+    u = u.reshape(-1, 2)
+    batch = BatchWindTurbineDynamics(len(x), reduced_order=wt.reduced_order, cp_table=wt.cp_table, config=wt.config)
+    A = np.empty((len(x), 4, 4))
+    B = np.empty((len(x), 4, 2))
+    for j in range(4):
+        h = eps*np.maximum(1.0, np.abs(x[:,j]))
+        dx = np.zeros_like(x)
+        dx[:,j] = h
+        A[:,:,j] = (batch.wind_turbine_ode(0.0, x + dx, u) - batch.wind_turbine_ode(0.0, x - dx, u))/(2*h[:,None])
+    for j in range(2):
+        h = eps*np.maximum(1.0, np.abs(u[:,j]))
+        du = np.zeros_like(u)
+        du[:,j] = h
+        B[:,:,j] = (batch.wind_turbine_ode(0.0, x, u + du) - batch.wind_turbine_ode(0.0, x, u - du))/(2*h[:,None])
+    return A.reshape(shape + (4,4)), B.reshape(shape + (4,2))
+
+#Jacobians of the OUTPUTS. Tem = Kg*Kphi*Ia, power = V*Ia with V = clip(Rl*Ia, -Vnom, Vnom)
+def output_jacobians(wt, x, u):
+    rotor = wt.rotor
+    shape = x.shape[:-1]
+    w = x[...,0]
+    Ia = x[...,1]
+    pitch = x[...,2]
+    if wt.reduced_order:
+        Ia = rotor.Ia_qss(rotor.Ea(np.clip(w, 2.5, 50)))
+    dw_sat = ((w >= 2.5) & (w <= 50)).astype(float)
+    dpitch_sat = ((pitch >= np.deg2rad(0)) & (pitch <= np.deg2rad(90))).astype(float)
+    V = rotor.Rl*Ia
+    dpower_dIa = np.where(np.abs(V) <= rotor.Vnom, 2*rotor.Rl*Ia, np.clip(V, -rotor.Vnom, rotor.Vnom))
+
+    C = np.zeros(shape + (len(OUTPUTS), 4))
+    D = np.zeros(shape + (len(OUTPUTS), 2))
+    C[...,0,0] = 1.0
+    C[...,1,2] = 1.0
+    if wt.reduced_order:
+        #Ia is algebraic: dIa/dw = Kg*Kphi/(Ra+Rl)
+        dIa_dw = dw_sat*rotor.KgKphi*rotor.inv_R
+        C[...,2,0] = rotor.KgKphi*dIa_dw
+        C[...,3,0] = dpower_dIa*dIa_dw
+    else:
+        C[...,2,1] = rotor.KgKphi
+        C[...,3,1] = dpower_dIa
+    return C, D
+
+
+"""
+Table of linear models along a wind grid, at the trim point holding w_nom (or at a fixed pitch)
+"""
+class GainSchedule():
+    def __init__(self, winds, x, u, A, B, C, D):
+        self.winds = np.asarray(winds, dtype=float)
+        self.x = x
+        self.u = u
+        self.A = A
+        self.B = B
+        self.C = C
+        self.D = D
+
+    @classmethod
+    def build(cls, wt, winds, w_nom=None, pitch=0.0, method="analytic"):
+        x, u = operating_points(wt, winds, pitch=pitch, w=w_nom)
+        A, B, C, D = linearize(wt, x, u, method=method)
+        return cls(winds, x, u, A, B, C, D)
+
+    #Linear interpolation of the table at wind speeds (clamped to the grid)
+    def __call__(self, wind):
+        wind = np.clip(np.asarray(wind, dtype=float), self.winds[0], self.winds[-1])
+        i = np.clip(np.searchsorted(self.winds, wind) - 1, 0, len(self.winds) - 2)
+        f = (wind - self.winds[i])/(self.winds[i+1] - self.winds[i])
+        lerp = lambda table: table[i] + (table[i+1] - table[i])*f.reshape(f.shape + (1,)*(table.ndim - 1))
+        return {name: lerp(getattr(self, name)) for name in ("x", "u", "A", "B", "C", "D")}
+
+    def save(self, file_path):
+        np.savez(file_path, winds=self.winds, x=self.x, u=self.u, A=self.A, B=self.B, C=self.C, D=self.D, outputs=np.array(OUTPUTS))
+
+    @classmethod
+    def load(cls, file_path):
+        data = np.load(file_path)
+        return cls(data["winds"], data["x"], data["u"], data["A"], data["B"], data["C"], data["D"])
+
+
+#Cached gain schedule for the model of wt. Memory cache first, then cache_dir, then build
+def get_gain_schedule(wt, winds, w_nom=None, pitch=0.0, method="analytic", cache_dir=None):
+    winds = np.asarray(winds, dtype=float)
+    config_key = tuple((section, tuple(sorted(values.items()))) for section, values in sorted(wt.config.items()))
+    table_key = None if wt.cp_table is None else (wt.cp_table.method, wt.cp_table.table.shape)
+    key = repr((config_key, wt.reduced_order, table_key, winds.tolist(), w_nom, pitch, method))
+    if key in _GAIN_SCHEDULES:
+        return _GAIN_SCHEDULES[key]
+
+    file_path = None
+    if cache_dir is not None:
+        file_path = os.path.join(cache_dir, "gain_schedule_{}.npz".format(hashlib.sha1(key.encode()).hexdigest()[:16]))
+    if file_path is not None and os.path.exists(file_path):
+        logging.info("Loading gain schedule from {}".format(file_path))
+        schedule = GainSchedule.load(file_path)
+    else:
+        schedule = GainSchedule.build(wt, winds, w_nom=w_nom, pitch=pitch, method=method)
+        if file_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            schedule.save(file_path)
+    _GAIN_SCHEDULES[key] = schedule
+    return schedule
@@ -0,0 +1,204 @@
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import zipfile
+
+import numpy as np
+
+"""
+Streaming log sink. Drop-in replacement for a ColumnarLog as myLog:
+    env.myLog = StreamingLogWriter("Logs/log_trains/run", env.LOG_COLUMNS, fmt="npz")
+Rows are collected in fixed-size float64 chunks. Full chunks are written to disk by a background thread.
+Files rotate every rotate_rows rows: <path>_0000.<ext>, <path>_0001.<ext>, ...
+Memory is bounded by (max_pending_chunks + 1) chunks whatever the run length. When the writer
+falls behind, append() blocks.
+Formats:
+    csv     text, gzip compressed with compress=True (.csv.gz)
+    npz     compressed zip of one .npy member per chunk, readable after every chunk
+    parquet one row group per chunk (needs pyarrow)
+"""
+
+FORMATS = ("csv", "npz", "parquet")
+
+
+class StreamingLogWriter():
+    def __init__(self, path, columns, fmt="csv", chunk_rows=4096, rotate_rows=1000000, max_pending_chunks=4, compress=True):
+        if fmt not in FORMATS:
+            raise ValueError("Unknown log format: {}".format(fmt))
+        if fmt == "parquet":
+            import pyarrow
+            import pyarrow.parquet
+        self.path = path
+        self.columns = tuple(columns)
+        self.fmt = fmt
+        self.compress = compress
+        self.chunk_rows = chunk_rows
+        self.rotate_rows = rotate_rows
+        self.rows = 0                   #Rows appended
+        self.buffer = np.empty((chunk_rows, len(self.columns)), dtype=np.float64)
+        self.n = 0
+
+        #Writer thread state
+        self.file_index = 0
+        self.rows_in_file = 0
+        self.chunks_in_file = 0
+        self.file = None
+        self.error = None
+        self.files = []
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        self.queue = queue.Queue(maxsize=max_pending_chunks)
+        self.thread = threading.Thread(target=self.run, name="StreamingLogWriter", daemon=True)
+        self.thread.start()
+        self.closed = False
+        atexit.register(self.close)
+
+    def append(self, row):
+        self.buffer[self.n] = row
+        self.n += 1
+        self.rows += 1
+        if self.n == self.chunk_rows:
+            self.flush()
+
+    def extend(self, rows):
+        for row in np.asarray(rows, dtype=np.float64):
+            self.append(row)
+
+    def __len__(self):
+        return self.rows
+
+    #Hand the current chunk to the writer thread
+    def flush(self):
+        if self.error is not None:
+            raise self.error
+        if self.n > 0:
+            self.queue.put(self.buffer[:self.n])
+            self.buffer = np.empty((self.chunk_rows, len(self.columns)), dtype=np.float64)
+            self.n = 0
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.closed = True
+        atexit.unregister(self.close)
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    #Background thread
+    def run(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self.write_chunk(chunk)
+            except Exception as error:
+                logging.error("Streaming log writer failed: {}".format(error))
+                self.error = error
+        try:
+            self.close_file()
+        except Exception as error:
+            self.error = error
+
+    def write_chunk(self, chunk):
+        while len(chunk) > 0:
+            if self.file is None:
+                self.open_file()
+            part = chunk[:self.rotate_rows - self.rows_in_file]
+            chunk = chunk[len(part):]
+            self.write_part(part)
+            self.rows_in_file += len(part)
+            self.chunks_in_file += 1
+            if self.rows_in_file >= self.rotate_rows:
+                self.close_file()
+
+    def file_name(self):
+        extension = {"csv": ".csv.gz" if self.compress else ".csv", "npz": ".npz", "parquet": ".parquet"}[self.fmt]
+        return "{}_{:04d}{}".format(self.path, self.file_index, extension)
+
+    def open_file(self):
+        name = self.file_name()
+        self.files.append(name)
+        if self.fmt == "csv":
+            self.file = gzip.open(name, "wt") if self.compress else open(name, "w")
+            self.file.write(",".join(self.columns) + "\n")
+        elif self.fmt == "npz":
+            with zipfile.ZipFile(name, "w") as file:
+                file.writestr("columns.json", json.dumps(self.columns))
+            self.file = name
+        else:
+            import pyarrow
+            import pyarrow.parquet
+            schema = pyarrow.schema([(column, pyarrow.float64()) for column in self.columns])
+            self.file = pyarrow.parquet.ParquetWriter(name, schema, compression="zstd" if self.compress else "none")
+
+    def write_part(self, part):
+        if self.fmt == "csv":
+            np.savetxt(self.file, part, delimiter=",", fmt="%.17g")
+            self.file.flush()
+        elif self.fmt == "npz":
+            #Reopen in append mode so the zip directory is valid after every chunk
+            compression = zipfile.ZIP_DEFLATED if self.compress else zipfile.ZIP_STORED
+            with zipfile.ZipFile(self.file, "a", compression=compression) as file:
+                with file.open("chunk_{:06d}.npy".format(self.chunks_in_file), "w") as member:
+                    np.lib.format.write_array(member, np.ascontiguousarray(part))
+        else:
+            import pyarrow
+            table = pyarrow.Table.from_arrays([pyarrow.array(part[:,j]) for j in range(len(self.columns))], names=list(self.columns))
+            self.file.write_table(table)
+
+    def close_file(self):
+        if self.file is None:
+            return
+        if self.fmt != "npz":
+            self.file.close()
+        self.file = None
+        self.file_index += 1
+        self.rows_in_file = 0
+        self.chunks_in_file = 0
+
+
+#Read back every file written under path as a dict of columns
+def read_streamed_log(path, fmt="csv"):
+    files = sorted(glob.glob(glob.escape(path) + "_[0-9][0-9][0-9][0-9].*"))
+    parts = []
+    columns = None
+    for name in files:
+        if fmt == "csv":
+            opener = gzip.open if name.endswith(".gz") else open
+            with opener(name, "rt") as file:
+                columns = file.readline().strip().split(",")
+                parts.append(np.loadtxt(file, delimiter=",", ndmin=2))
+        elif fmt == "npz":
+            with zipfile.ZipFile(name) as file:
+                columns = json.loads(file.read("columns.json"))
+                for member in sorted(m for m in file.namelist() if m.endswith(".npy")):
+                    with file.open(member) as data:
+                        parts.append(np.lib.format.read_array(data))
+        else:
+            import pyarrow.parquet
+            table = pyarrow.parquet.read_table(name)
+            columns = table.column_names
+            parts.append(np.column_stack([table.column(c).to_numpy() for c in columns]))
+    if columns is None:
+        return {}
+    data = np.concatenate(parts) if parts else np.empty((0, len(columns)))
+    return {column: data[:,j] for j, column in enumerate(columns)}
@@ -0,0 +1,90 @@
+import copy
+import json
+import math
+import os
+
+"""
+Wind turbine model parameters.
+A config is a dict (or a JSON file such as cfg/model_3_cfg.json) with the sections:
+    WindTurbine     c1..c9 Cp coefficients, rho [kg/m^3], R [m]
+    Rotor           J, Kf, Kg, Kphi, La, Vnom, Ra, Rl
+    PitchActuator   tao [s], max_rate [deg/s]             (optional)
+    InitialState    w0, Ia0, pitch0 [rad], dpitchdt0      (optional)
+Missing optional sections take the DEFAULT_MODEL_CONFIG values.
+Parsed files are cached on (path, modification time).
+"""
+
+MODEL_PARAMETERS = {
+    "WindTurbine": ("c1", "c2", "c3", "c4", "c5", "c6", "c7", "c8", "c9", "rho", "R"),
+    "Rotor": ("J", "Kf", "Kg", "Kphi", "La", "Vnom", "Ra", "Rl"),
+    "PitchActuator": ("tao", "max_rate"),
+    "InitialState": ("w0", "Ia0", "pitch0", "dpitchdt0"),
+}
+OPTIONAL_SECTIONS = ("PitchActuator", "InitialState")
+POSITIVE_PARAMETERS = ("rho", "R", "J", "Kg", "Kphi", "La", "Vnom", "Rl", "tao", "max_rate")
+NON_NEGATIVE_PARAMETERS = ("Kf", "Ra")
+
+#Small wind turbine of the Simulink model
+DEFAULT_MODEL_CONFIG = {
+    "WindTurbine": {"c1": 0.73, "c2": 151, "c3": 0.58, "c4": 0.002, "c5": 2.14, "c6": 13.2, "c7": 18.4, "c8": -0.02, "c9": -0.003,
+                    "rho": 1.223, "R": 3.2*0.98},
+    "Rotor": {"J": 6.53, "Kf": 0.025, "Kg": 23.31, "Kphi": 0.264, "La": 13.5e-3, "Vnom": 240, "Ra": 0.275, "Rl": 8},
+    "PitchActuator": {"tao": 0.2, "max_rate": 5},
+    "InitialState": {"w0": 40, "Ia0": 30, "pitch0": 0, "dpitchdt0": 0},
+}
+
+#15MW turbine (was wt_dynamics_15MW.py)
+MODEL_15MW_CONFIG = {
+    "WindTurbine": dict(DEFAULT_MODEL_CONFIG["WindTurbine"], c2=2000, R=120),
+    "Rotor": dict(DEFAULT_MODEL_CONFIG["Rotor"], J=1e7, Kf=1e4, Kg=60),
+    "PitchActuator": dict(DEFAULT_MODEL_CONFIG["PitchActuator"]),
+    "InitialState": dict(DEFAULT_MODEL_CONFIG["InitialState"], w0=0.2),
+}
+
+_MODEL_CONFIGS = {}
+
+
+#config: None (default model), dict or path to a JSON file. Returns a validated config dict (shared, do not modify)
+def load_model_config(config=None):
+    if config is None or config == "":
+        return DEFAULT_MODEL_CONFIG
+    if isinstance(config, dict):
+        return validate_model_config(config)
+
+    path = os.path.realpath(config)
+    key = (path, os.path.getmtime(path))
+    if key not in _MODEL_CONFIGS:
+        with open(path) as file:
+            _MODEL_CONFIGS[key] = validate_model_config(json.load(file), source=path)
+    return _MODEL_CONFIGS[key]
+
+def validate_model_config(config, source="model config"):
+    unknown = set(config) - set(MODEL_PARAMETERS)
+    if unknown:
+        raise ValueError("{}: unknown sections {}".format(source, sorted(unknown)))
+
+    validated = {}
+    for section, names in MODEL_PARAMETERS.items():
+        if section not in config:
+            if section not in OPTIONAL_SECTIONS:
+                raise ValueError("{}: missing section {}".format(source, section))
+            validated[section] = copy.deepcopy(DEFAULT_MODEL_CONFIG[section])
+            continue
+        values = dict(config[section])
+        if section in OPTIONAL_SECTIONS:
+            values = dict(DEFAULT_MODEL_CONFIG[section], **values)
+        unknown = set(values) - set(names)
+        missing = set(names) - set(values)
+        if unknown or missing:
+            raise ValueError("{}: section {} unknown {} missing {}".format(source, section, sorted(unknown), sorted(missing)))
+        for name in names:
+            value = values[name]
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                raise ValueError("{}: {}.{} must be a finite number, got {!r}".format(source, section, name, value))
+            if name in POSITIVE_PARAMETERS and value <= 0:
+                raise ValueError("{}: {}.{} must be positive, got {}".format(source, section, name, value))
+            if name in NON_NEGATIVE_PARAMETERS and value < 0:
+                raise ValueError("{}: {}.{} must be non negative, got {}".format(source, section, name, value))
+            values[name] = float(value)
+        validated[section] = values
+    return validated
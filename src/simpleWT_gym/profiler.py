@@ -0,0 +1,200 @@
+import argparse
+import importlib
+import logging
+import time
+
+import numpy as np
+
+"""
+Opt-in per-phase profiling of a gym env (SimpleWtGym and its presets).
+PhaseProfiler(env) wraps, on the instance only, the env methods of the step pipeline
+    step, reset, map_inputs, control_step, reward, integral_movil, map_outputs, do_terminate, log_callback
+and the simulator step/step_interval (the solver calls). Each wrapper adds one call and two
+time.perf_counter_ns() reads to a [calls, ns] counter. Nothing is wrapped until a profiler is attached and
+detach() restores the class methods, so envs without a profiler run exactly the original code.
+Solver counters (nfev, naccepted, nrejected, nresets) are differences of the integrator cumulative stats.
+An episode goes from a reset to the step returning done (or to the next reset / end_episode()).
+Times are inclusive: step contains the phases, reward contains integral_movil, control_step contains
+the solver calls and reset contains the burn-in steps.
+The wrappers are bound to the env: detach before copying it (copy.deepcopy of a wrapped env would time and run the original).
+Usage:
+    profiler = PhaseProfiler(env)
+    ...training...
+    print(format_report(profiler.summary()))
+    python -m simpleWT_gym.profiler --gym 9 --episodes 3 --integrator RK4
+"""
+
+ENV_PHASES = ("step", "reset", "map_inputs", "control_step", "reward", "integral_movil", "map_outputs", "do_terminate", "log_callback")
+SIM_PHASES = ("step", "step_interval")
+SOLVER_STATS = ("nfev", "naccepted", "nrejected", "nresets")
+
+
+#method timed into counter [calls, ns]
+def timed(method, counter):
+    perf_counter_ns = time.perf_counter_ns
+    def wrapper(*args, **kwargs):
+        t0 = perf_counter_ns()
+        result = method(*args, **kwargs)
+        counter[1] += perf_counter_ns() - t0
+        counter[0] += 1
+        return result
+    return wrapper
+
+
+class PhaseProfiler():
+    def __init__(self, env):
+        self.env = env
+        self.counters = dict(("env." + name, [0, 0]) for name in ENV_PHASES if hasattr(env, name))
+        self.counters.update(("sim." + name, [0, 0]) for name in SIM_PHASES)
+        self.episodes = [] #Reports of the finished episodes
+        self.wt_sim = None
+        self.stats0 = {}
+        self.t0 = time.perf_counter_ns()
+
+        for name in ENV_PHASES:
+            if hasattr(env, name):
+                setattr(env, name, timed(getattr(env, name), self.counters["env." + name]))
+        #Episode boundaries around the timed step/reset
+        step, reset = env.step, env.reset
+        def step_episode(action):
+            result = step(action)
+            if result[2]:
+                self.end_episode()
+            return result
+        def reset_episode(*args, **kwargs):
+            if self.counters["env.step"][0]:
+                self.end_episode()
+            return reset(*args, **kwargs)
+        env.step = step_episode
+        env.reset = reset_episode
+        #The simulator is built on the first reset: wrapped as soon as it exists
+        init_simulator = env.init_simulator
+        def init_and_attach():
+            init_simulator()
+            self.attach_simulator()
+        env.init_simulator = init_and_attach
+        self.attach_simulator()
+
+    def attach_simulator(self):
+        wt_sim = self.env.wt_sim
+        if wt_sim is None or wt_sim is self.wt_sim:
+            return
+        self.detach_simulator()
+        self.stats0 = dict(wt_sim.integrator.stats)
+        self.wt_sim = wt_sim
+        for name in SIM_PHASES:
+            setattr(wt_sim, name, timed(getattr(wt_sim, name), self.counters["sim." + name]))
+
+    def detach_simulator(self):
+        if self.wt_sim is not None:
+            for name in SIM_PHASES:
+                self.wt_sim.__dict__.pop(name, None)
+            self.wt_sim = None
+
+    #Restore the class methods. The profiler keeps its reports
+    def detach(self):
+        for name in ENV_PHASES + ("init_simulator",):
+            self.env.__dict__.pop(name, None)
+        self.detach_simulator()
+
+    #Report of the episode so far (counters are not cleared)
+    def episode_report(self):
+        steps = self.counters["env.step"][0]
+        phases = {}
+        for name, (calls, ns) in self.counters.items():
+            if calls:
+                phases[name] = {"calls": calls, "total_ms": ns*1e-6, "mean_us": ns*1e-3/calls,
+                                "per_step_us": ns*1e-3/steps if steps else None}
+        solver = {"calls": self.counters["sim.step"][0] + self.counters["sim.step_interval"][0]}
+        if self.wt_sim is not None:
+            stats = self.wt_sim.integrator.stats
+            for name in SOLVER_STATS:
+                if name in stats:
+                    solver[name] = stats[name] - self.stats0.get(name, 0)
+        if steps and "nfev" in solver:
+            solver["nfev_per_step"] = solver["nfev"]/steps
+        return {"episode": len(self.episodes), "steps": steps, "wall_ms": (time.perf_counter_ns() - self.t0)*1e-6,
+                "phases": phases, "solver": solver}
+
+    #Close the current episode: store its report and start counting a new one
+    def end_episode(self):
+        report = self.episode_report()
+        self.episodes.append(report)
+        for counter in self.counters.values():
+            counter[0] = counter[1] = 0
+        if self.wt_sim is not None:
+            self.stats0 = dict(self.wt_sim.integrator.stats)
+        self.t0 = time.perf_counter_ns()
+        return report
+
+    #Totals over the finished episodes (and the current one if it has steps)
+    def summary(self):
+        reports = list(self.episodes)
+        if self.counters["env.step"][0]:
+            reports.append(self.episode_report())
+        steps = sum(report["steps"] for report in reports)
+        phases = {}
+        for report in reports:
+            for name, phase in report["phases"].items():
+                total = phases.setdefault(name, {"calls": 0, "total_ms": 0.0})
+                total["calls"] += phase["calls"]
+                total["total_ms"] += phase["total_ms"]
+        for phase in phases.values():
+            phase["mean_us"] = phase["total_ms"]*1e3/phase["calls"]
+            phase["per_step_us"] = phase["total_ms"]*1e3/steps if steps else None
+        solver = {}
+        for report in reports:
+            for name, value in report["solver"].items():
+                if name != "nfev_per_step":
+                    solver[name] = solver.get(name, 0) + value
+        if steps and "nfev" in solver:
+            solver["nfev_per_step"] = solver["nfev"]/steps
+        return {"episodes": len(reports), "steps": steps, "wall_ms": sum(report["wall_ms"] for report in reports),
+                "phases": phases, "solver": solver}
+
+
+#Text table of an episode_report/summary. Phase shares are of the total step time
+def format_report(report):
+    step_ms = report["phases"].get("env.step", {}).get("total_ms", 0.0)
+    lines = ["{} steps, {:.1f} ms wall".format(report["steps"], report["wall_ms"])]
+    lines.append("{:18s} {:>9s} {:>11s} {:>10s} {:>13s} {:>7s}".format("phase", "calls", "total [ms]", "mean [us]", "per step [us]", "% step"))
+    for name, phase in report["phases"].items():
+        share = 100*phase["total_ms"]/step_ms if step_ms and name != "env.reset" else float("nan")
+        per_step = phase["per_step_us"] if phase["per_step_us"] is not None else float("nan")
+        lines.append("{:18s} {:9d} {:11.2f} {:10.2f} {:13.2f} {:7.1f}".format(name, phase["calls"], phase["total_ms"], phase["mean_us"], per_step, share))
+    lines.append("solver " + "  ".join("{}={:.4g}".format(name, value) for name, value in report["solver"].items()))
+    return "\n".join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="python -m simpleWT_gym.profiler", description="Per-phase step profile of a SimpleWtGym preset")
+    parser.add_argument("--gym", type=int, default=9, choices=range(1, 10))
+    parser.add_argument("--episodes", type=int, default=2)
+    parser.add_argument("--integrator", default="RK45")
+    parser.add_argument("--single-call", action="store_true")
+    parser.add_argument("--t-max", type=float, default=10.0, help="Episode length [s]")
+    parser.add_argument("--action", type=float, default=0.1, help="Constant normalized action")
+    parser.add_argument("--no-mylog", action="store_true")
+    args = parser.parse_args(args)
+
+    module = importlib.import_module("simpleWT_gym.simple_wt_gym_{}".format(args.gym))
+    options = {"integrator": args.integrator, "t_max": args.t_max}
+    if args.single_call:
+        options["single_call"] = True
+    env = getattr(module, "SimpleWtGym{}".format(args.gym))(**options)
+    env.enable_myLog = int(not args.no_mylog)
+    np.random.seed(0)
+    profiler = PhaseProfiler(env)
+    for episode in range(args.episodes):
+        env.reset()
+        done = False
+        while not done:
+            obs, reward, done, info = env.step([args.action])
+    for report in profiler.episodes:
+        print("Episode {}: {}".format(report["episode"], format_report(report)))
+    print("Total: {}".format(format_report(profiler.summary())))
+    profiler.detach()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,52 @@
+import numpy as np
+
+"""
+Columnar log recorder. One preallocated float64 column per signal, grown by doubling.
+The schema (column names) is fixed at construction, rows are appended in schema order.
+Columns are exported as zero-copy NumPy views or as a pandas DataFrame.
+"""
+class ColumnarLog():
+    def __init__(self, columns, capacity=1024):
+        self.columns = tuple(columns)
+        self.column_index = {name: j for j, name in enumerate(self.columns)}
+        #Fortran order: every column is contiguous
+        self.data = np.empty((capacity, len(self.columns)), dtype=np.float64, order='F')
+        self.n = 0
+
+    #O(1) amortized append of one row with a value per column
+    def append(self, row):
+        if self.n == self.data.shape[0]:
+            self.grow()
+        self.data[self.n] = row
+        self.n += 1
+
+    #Append a block of rows (n, len(columns))
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)
+        while self.n + len(rows) > self.data.shape[0]:
+            self.grow()
+        self.data[self.n:self.n + len(rows)] = rows
+        self.n += len(rows)
+
+    def grow(self):
+        data = np.empty((2*self.data.shape[0], len(self.columns)), dtype=np.float64, order='F')
+        data[:self.n] = self.data[:self.n]
+        self.data = data
+
+    def clear(self):
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    #Column view
+    def __getitem__(self, name):
+        return self.data[:self.n, self.column_index[name]]
+
+    #Dict of column views (no copy)
+    def to_numpy(self):
+        return {name: self.data[:self.n, j] for j, name in enumerate(self.columns)}
+
+    def to_pandas(self):
+        import pandas as pd
+        return pd.DataFrame(self.data[:self.n], columns=list(self.columns), copy=False)
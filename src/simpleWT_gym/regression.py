@@ -0,0 +1,222 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+from .model_config import DEFAULT_MODEL_CONFIG, MODEL_15MW_CONFIG
+from .wt_dynamics import WindTurbineSimulator
+
+"""
+Numerical regression against the reference runs stored in Logs/log_trains.
+Each case replays the scenario behind a log (pitch_ref schedule of example/stair_WindTurbineSimulator.py,
+wind, duration and model config) with WindTurbineSimulator and compares every logged signal sample by sample:
+    |y - y_ref| <= atol + rtol*|y_ref|          (per signal tolerances, one vectorized check per case)
+For each signal the report gives the max and RMS absolute errors, the max error relative to max|y_ref| and the
+time of the max error. A run passes when every signal of every checked case is within tolerance.
+Case status:
+    check   reproduced by the current model, must pass
+    xfail   replayed and reported, not counted (reference parameters unknown)
+    skip    not reproducible by the current model (reason given)
+Usage:
+    python -m simpleWT_gym.regression
+    python -m simpleWT_gym.regression --integrators RK45 RK4 --rtol 1e-3 --output Logs/regression.json
+"""
+
+LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "Logs", "log_trains")
+
+#Signal: (rtol, atol)
+TOLERANCES = {
+    "Cp": (1e-6, 1e-9),
+    "Lambda_i": (1e-6, 1e-9),
+    "Lambda": (1e-6, 1e-9),
+    "Tem": (1e-6, 1e-9),
+    "Tm": (1e-6, 1e-9),
+    "Ia": (1e-6, 1e-9),
+    "Ea": (1e-6, 1e-9),
+    "w": (1e-6, 1e-9),
+    "pitch": (1e-6, 1e-9),
+    "dpitch": (1e-6, 1e-9),
+    "pitch_ref": (0.0, 1e-12),
+    "power": (1e-6, 1e-6),
+}
+#Sample times of a replay and its reference must agree to this [s]
+TIME_TOLERANCE = 1e-9
+
+
+#pitch_ref(t): levels[0] before times[0], levels[i+1] from times[i] on. Same comparisons (ts < time) as the
+#stair functions of example/stair_WindTurbineSimulator.py, so the replayed inputs are bit identical
+def stair(times, levels):
+    times = np.asarray(times, dtype=float)
+    return lambda t: levels[np.searchsorted(times, t, side="right")]
+
+#step_40deg/step_2deg of the example (edited to the step size of the run): only their first step falls in 80 s
+def pitch_step(degrees):
+    return stair([40], [0.0, np.radians(degrees)])
+
+#pitch_stair of the example (stair_WindTurbineSimulator_15MW.py)
+def pitch_stair():
+    return stair([40, 80, 120, 160], [0.0, np.pi/4, np.pi/3, np.pi/2, 0.0])
+
+#First order pitch actuator of the November 2024 runs: 2 s time constant, without or with the 5º/s rate limit
+SLOW_ACTUATOR = dict(DEFAULT_MODEL_CONFIG, PitchActuator={"tao": 2.0, "max_rate": 1e6})
+SLOW_RATE_LIMITED_ACTUATOR = dict(DEFAULT_MODEL_CONFIG, PitchActuator={"tao": 2.0, "max_rate": 5.0})
+
+SECOND_ORDER = "second order pitch actuator (WindTurbineDynamics.pitch_actuator_ode), not selectable in the model"
+GYM_EPISODE = "gym episode: the random wind is not logged"
+UNKNOWN_15MW = "15MW parameters of the run not recorded: neither MODEL_15MW_CONFIG nor the old wt_dynamics_15MW.py (J = 10^7, i.e. 13) reproduce it"
+
+#Reference log file: case. schedule is a function returning pitch_ref(t)
+REFERENCE_CASES = {
+    "model_WT_Dynamics_Step10_1st_order_11_24_2024_21_32_22.csv":
+        {"status": "check", "schedule": lambda: pitch_step(10), "wind": 12.3, "t_end": 80, "config": SLOW_ACTUATOR},
+    "model_WT_Dynamics_Step10_1st_order_rate_limited_11_24_2024_21_31_55.csv":
+        {"status": "check", "schedule": lambda: pitch_step(10), "wind": 12.3, "t_end": 80, "config": SLOW_RATE_LIMITED_ACTUATOR},
+    "model_WT_Dynamics_Step40_1st_order_11_24_2024_21_28_31.csv":
+        {"status": "check", "schedule": lambda: pitch_step(40), "wind": 12.3, "t_end": 80, "config": SLOW_ACTUATOR},
+    "model_WT_Dynamics_Step40_1st_order_rate_limited_11_24_2024_21_28_10.csv":
+        {"status": "check", "schedule": lambda: pitch_step(40), "wind": 12.3, "t_end": 80, "config": SLOW_RATE_LIMITED_ACTUATOR},
+    "model_WT_Dynamics_15MW_0_01_15_2025_20_36_23.csv":
+        {"status": "xfail", "schedule": pitch_stair, "wind": 18, "t_end": 200, "config": MODEL_15MW_CONFIG, "reason": UNKNOWN_15MW},
+    "model_WT_Dynamics_15MW_0_01_16_2025_18_18_25.csv":
+        {"status": "xfail", "schedule": pitch_stair, "wind": 18, "t_end": 200, "config": MODEL_15MW_CONFIG, "reason": UNKNOWN_15MW},
+    "model_WT_Dynamics_Step10_2nd_order_11_24_2024_21_31_08.csv": {"status": "skip", "reason": SECOND_ORDER},
+    "model_WT_Dynamics_Step40_2nd_order_11_24_2024_21_29_11.csv": {"status": "skip", "reason": SECOND_ORDER},
+    "model_WT_Dynamics_step2_11_01_2024_14_41_43.csv": {"status": "skip", "reason": SECOND_ORDER},
+    "model_WT_Dynamics_deg2_mini_stair_11_01_2024_14_43_03.csv": {"status": "skip", "reason": SECOND_ORDER},
+    "model_WT_Dynamics_deg2_mini_stair_11_01_2024_14_47_21.csv": {"status": "skip", "reason": SECOND_ORDER + " (same run as Step40_2nd_order)"},
+    "model_Gym_1_11_01_2024_13_47_00.csv": {"status": "skip", "reason": GYM_EPISODE},
+    "model_Gym_2_11_01_2024_19_31_52.csv": {"status": "skip", "reason": GYM_EPISODE},
+    "model_gym_11_01_2024_19_38_11.csv": {"status": "skip", "reason": GYM_EPISODE},
+    "model_gym_RL_11_01_2024_21_07_32.csv": {"status": "skip", "reason": GYM_EPISODE},
+}
+
+
+#Log written by utils.log_and_exit (DataFrame.to_csv: unnamed index column first). Returns {column: array}
+def load_reference(path):
+    with open(path) as file:
+        header = [name.strip() for name in file.readline().split(",")]
+    values = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    return dict((name, values[:,j]) for j, name in enumerate(header) if name)
+
+#Run the case scenario with myLog enabled. Returns {column: array} like load_reference
+def replay(case, integrator="RK45"):
+    sim = WindTurbineSimulator(integrator=integrator, config=case["config"])
+    sim.enable_myLog = 1
+    schedule = case["schedule"]()
+    wind = case["wind"]
+    while sim.ti < case["t_end"]:
+        sim.step([schedule(sim.ti), wind])
+    return dict((name, np.array(column)) for name, column in sim.myLog.to_numpy().items())
+
+#Signal by signal errors of a replay against its reference, checked against tolerances {signal: (rtol, atol)}
+#Returns (passed, {signal: stats}, problem). Signals of the reference missing from the replay fail
+def compare_runs(result, reference, tolerances=TOLERANCES):
+    if len(result["time"]) != len(reference["time"]):
+        return False, {}, "{} samples instead of {}".format(len(result["time"]), len(reference["time"]))
+    time_error = np.max(np.abs(result["time"] - reference["time"]))
+    if time_error > TIME_TOLERANCE:
+        return False, {}, "sample times differ by up to {:.3g} s".format(time_error)
+
+    signals = [name for name in reference if name != "time"]
+    missing = [name for name in signals if name not in result]
+    signals = [name for name in signals if name in result]
+    y = np.column_stack([result[name] for name in signals])
+    y_ref = np.column_stack([reference[name] for name in signals])
+    rtol, atol = np.array([tolerances.get(name, (0.0, 0.0)) for name in signals]).T
+
+    error = np.abs(y - y_ref)
+    error[np.isnan(error)] = np.inf #NaN or inf on one side only never passes
+    error[(y == y_ref) | (np.isnan(y) & np.isnan(y_ref))] = 0.0
+    within = error <= atol + rtol*np.abs(y_ref)
+    i_max = np.argmax(error, axis=0)
+    max_error = error[i_max, np.arange(len(signals))]
+    scale = np.max(np.abs(np.where(np.isfinite(y_ref), y_ref, 0.0)), axis=0)
+    with np.errstate(invalid="ignore", over="ignore"):
+        rms_error = np.sqrt(np.mean(error**2, axis=0))
+    relative_error = np.divide(max_error, scale, out=np.where(max_error > 0, np.inf, 0.0), where=scale > 0)
+
+    stats = {}
+    for j, name in enumerate(signals):
+        stats[name] = {"max_error": float(max_error[j]), "rms_error": float(rms_error[j]),
+                       "relative_error": float(relative_error[j]), "time_of_max": float(reference["time"][i_max[j]]),
+                       "failed_samples": int(np.count_nonzero(~within[:,j])), "passed": bool(within[:,j].all())}
+    problem = "signals not logged: {}".format(", ".join(missing)) if missing else None
+    return all(signal["passed"] for signal in stats.values()) and not missing, stats, problem
+
+#Report of one reference log: {"log", "status", "integrator", "passed", "signals", "problem"/"reason"}
+def run_case(log, case, integrator="RK45", log_dir=LOG_DIR, tolerances=TOLERANCES):
+    report = {"log": log, "status": case["status"], "integrator": integrator}
+    if case["status"] == "skip":
+        report["reason"] = case["reason"]
+        return report
+    if "reason" in case:
+        report["reason"] = case["reason"]
+    reference = load_reference(os.path.join(log_dir, log))
+    passed, stats, problem = compare_runs(replay(case, integrator), reference, tolerances)
+    report["passed"] = passed
+    report["signals"] = stats
+    if problem:
+        report["problem"] = problem
+    return report
+
+#Run the cases of the given logs (None: all the cases found in log_dir). Returns (passed, reports)
+#Reference logs without a case are reported as skipped
+def run_regression(logs=None, integrators=("RK45",), log_dir=LOG_DIR, tolerances=TOLERANCES, xfail=True):
+    if logs is None:
+        logs = sorted(name for name in os.listdir(log_dir) if name.endswith(".csv"))
+    reports = []
+    for log in logs:
+        case = REFERENCE_CASES.get(log, {"status": "skip", "reason": "no regression case for this log"})
+        if case["status"] == "skip" or (case["status"] == "xfail" and not xfail):
+            reports.append(run_case(log, dict(case, status="skip")))
+            continue
+        for integrator in integrators:
+            logging.info("Replaying {} with {}".format(log, integrator))
+            reports.append(run_case(log, case, integrator, log_dir, tolerances))
+    passed = all(report["passed"] for report in reports if report["status"] == "check")
+    return passed, reports
+
+def print_report(report):
+    if report["status"] == "skip":
+        print("SKIP  {}: {}".format(report["log"], report["reason"]))
+        return
+    if report["passed"]:
+        outcome = "XPASS" if report["status"] == "xfail" else "PASS"
+    else:
+        outcome = "XFAIL" if report["status"] == "xfail" else "FAIL"
+    print("{:5s} {} [{}]{}".format(outcome, report["log"], report["integrator"],
+                                  ": " + report["problem"] if "problem" in report else ""))
+    for name, signal in report["signals"].items():
+        print("    {:10s} {:4s} max {:10.3e} (rel {:9.2e}) at t={:8.2f}  rms {:10.3e}{}".format(
+            name, "ok" if signal["passed"] else "FAIL", signal["max_error"], signal["relative_error"], signal["time_of_max"],
+            signal["rms_error"], "" if signal["passed"] else "  {} samples out".format(signal["failed_samples"])))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="python -m simpleWT_gym.regression", description="Replay the Logs/log_trains reference runs and compare every signal")
+    parser.add_argument("logs", nargs="*", help="Reference log file names (default: all in --log-dir)")
+    parser.add_argument("--log-dir", default=LOG_DIR)
+    parser.add_argument("--integrators", nargs="+", default=["RK45"])
+    parser.add_argument("--rtol", type=float, help="Relative tolerance of every signal (default: TOLERANCES)")
+    parser.add_argument("--atol", type=float, help="Absolute tolerance of every signal (default: TOLERANCES)")
+    parser.add_argument("--no-xfail", action="store_true", help="Do not replay the expected failures")
+    parser.add_argument("--output", help="JSON report file")
+    args = parser.parse_args(args)
+
+    tolerances = dict((name, (args.rtol if args.rtol is not None else rtol, args.atol if args.atol is not None else atol))
+                      for name, (rtol, atol) in TOLERANCES.items())
+    passed, reports = run_regression(args.logs or None, args.integrators, args.log_dir, tolerances, xfail=not args.no_xfail)
+    for report in reports:
+        print_report(report)
+    print("PASSED" if passed else "FAILED")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"passed": passed, "tolerances": tolerances, "reports": reports}, file, indent=1)
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import math
+
+import numpy as np
+
+"""
+Fixed capacity ring buffers with an O(1) running sum (moving window sum / integral).
+The sum is compensated (Kahan-Babuska-Neumaier) and recomputed exactly every time the write
+position wraps around, so the rounding error does not grow with the run length.
+RingBuffer: one window (per env). BatchRingBuffer: (N, window) for vectorized envs.
+"""
+
+class RingBuffer():
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        if self.capacity < 1:
+            raise ValueError("RingBuffer capacity must be at least 1, got {}".format(capacity))
+        self.clear()
+
+    def clear(self):
+        self.data = [0.0]*self.capacity     #Python floats: faster than numpy for scalar access
+        self.head = 0                       #Next write position
+        self.n = 0
+        self.total = 0.0
+        self.compensation = 0.0
+
+    #Add a value, dropping the oldest one when full
+    def append(self, value):
+        value = float(value)
+        head = self.head
+        if self.n == self.capacity:
+            self.add(-self.data[head])
+        else:
+            self.n += 1
+        self.data[head] = value
+        self.add(value)
+        head += 1
+        if head == self.capacity:
+            head = 0
+            self.total = math.fsum(self.data)
+            self.compensation = 0.0
+        self.head = head
+
+    def add(self, value):
+        total = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    @property
+    def sum(self):
+        return self.total + self.compensation
+
+    def __len__(self):
+        return self.n
+
+    #Values from oldest to newest
+    def values(self):
+        if self.n < self.capacity:
+            return np.array(self.data[:self.n])
+        return np.array(self.data[self.head:] + self.data[:self.head])
+
+    #Element-wise interpolation with a buffer of the same shape and fill (used by the burn-in cache)
+    def interpolate(self, other, weight):
+        buffer = RingBuffer(self.capacity)
+        if other.capacity != self.capacity or other.n != self.n or other.head != self.head:
+            other = self if weight < 0.5 else other
+        buffer.data = [(1 - weight)*a + weight*b for a, b in zip(self.data, other.data)]
+        buffer.head = self.head
+        buffer.n = self.n
+        buffer.total = math.fsum(buffer.data)
+        return buffer
+
+
+class BatchRingBuffer():
+    def __init__(self, n, capacity):
+        self.capacity = int(capacity)
+        if self.capacity < 1:
+            raise ValueError("BatchRingBuffer capacity must be at least 1, got {}".format(capacity))
+        self.data = np.zeros((n, self.capacity))
+        self.head = np.zeros(n, dtype=int)
+        self.count = np.zeros(n, dtype=int)
+        self.total = np.zeros(n)
+        self.compensation = np.zeros(n)
+
+    #Back to empty for the selected rows
+    def clear(self, idx=slice(None)):
+        self.data[idx] = 0
+        self.head[idx] = 0
+        self.count[idx] = 0
+        self.total[idx] = 0
+        self.compensation[idx] = 0
+
+    #Append one value per selected row (values has one entry per selected row)
+    def append(self, values, idx=slice(None)):
+        rows = np.arange(len(self.data))[idx]
+        head = self.head[rows]
+        full = self.count[rows] == self.capacity
+        total = self.total[rows]
+        compensation = self.compensation[rows]
+        total, compensation = self.add(total, compensation, np.where(full, -self.data[rows, head], 0.0))
+        total, compensation = self.add(total, compensation, values)
+        self.data[rows, head] = values
+        self.count[rows] = np.minimum(self.count[rows] + 1, self.capacity)
+
+        head = head + 1
+        wrapped = head == self.capacity
+        head[wrapped] = 0
+        if wrapped.any():
+            #Resync the rows that wrapped
+            total[wrapped] = np.sum(self.data[rows[wrapped]], axis=1)
+            compensation[wrapped] = 0
+        self.head[rows] = head
+        self.total[rows] = total
+        self.compensation[rows] = compensation
+
+    @staticmethod
+    def add(total, compensation, values):
+        new_total = total + values
+        compensation = compensation + np.where(np.abs(total) >= np.abs(values), (total - new_total) + values, (values - new_total) + total)
+        return new_total, compensation
+
+    def sum(self, idx=slice(None)):
+        return self.total[idx] + self.compensation[idx]
+
+    def copy(self):
+        buffer = BatchRingBuffer(len(self.data), self.capacity)
+        for name in ("data", "head", "count", "total", "compensation"):
+            setattr(buffer, name, getattr(self, name).copy())
+        return buffer
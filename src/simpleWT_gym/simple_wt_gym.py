@@ -0,0 +1,383 @@
+import logging
+
+import gym
+from gym import spaces
+import numpy as np
+
+from .burn_in_cache import get_burn_in_cache
+from .env_state import get_env_state, set_env_state
+from .recorder import ColumnarLog
+from .ring_buffer import RingBuffer
+from .turbulent_wind import TurbulentWind
+from .wt_dynamics import WindTurbineSimulator
+
+"""
+Configurable wind turbine gym. The step pipeline is assembled once in __init__ from four stages:
+    action          PitchIncrement (normalized rate, +pitch_ref or +pitch) or AbsolutePitch
+    wind            ConstantWind, RandomWind (new value each episode), SineWind or TurbulentWind (time varying)
+                    BankWind (wind_bank.py) replays scenarios of a memory-mapped wind bank
+                    FileWind (wind_file.py) replays random windows of measured wind files
+    observations    names in OBSERVATIONS ("error_wg", "pitch", "Vx", "pitch_ref", "integral_error")
+    reward          SquaredErrorReward or IntegralErrorReward (moving integral of the speed error)
+Stages are given by name (defaults below) or as instances. step() runs
+    map_inputs -> control_step -> reward(state) -> map_outputs(state) -> do_terminate -> log_callback
+The reward is computed on the state reached by the action (gym 9 used the previous observation).
+simple_wt_gym_1..9 are presets of this class.
+Usage:
+    env = SimpleWtGym(wind="sine", observations=("error_wg", "pitch", "Vx"), reward="squared_error")
+    env = SimpleWtGym(action=PitchIncrement(rate=2), reward=IntegralErrorReward(2))
+"""
+
+#Base myLog columns: time, action, WindTurbineDynamics signals
+LOG_SIGNALS = {"Cp": "Cp", "Lambda_i": "Lambda_i", "Lambda": "Labmda", "Tem": "Tem", "Tm": "Tm", "Ia": "Ia", "Ea": "Ea",
+               "w": "w", "pitch": "pitch", "dpitch": "dptich", "pitch_ref": "pitch_ref", "power": "power"}
+
+#Observation name: (value from the env and the simulator state x, low, high)
+OBSERVATIONS = {
+    "error_wg": (lambda env, x: env.wg_nom - x[0], -10, 10),
+    "pitch": (lambda env, x: x[2], 0, np.pi/2),
+    "Vx": (lambda env, x: env.Vx, 0, 40),
+    "pitch_ref": (lambda env, x: env.wt_sim.wt.pitch_ref, 0, np.pi/2),
+    "integral_error": (lambda env, x: env.integral_error, 0, 20),
+}
+
+
+"""
+Action stages: normalized action -> simulator input [pitch_ref, wind]
+"""
+class PitchIncrement():
+    #rate: pitch rate of a normalized action of 1 [deg/s], applied over one control step
+    #base: "pitch_ref" (last reference) or "pitch" (measured pitch). clip: clamp to [0, 90] deg
+    def __init__(self, rate=5, base="pitch_ref", clip=True):
+        self.rate = rate
+        self.base = base
+        self.clip = clip
+        self.low = np.array([-1], dtype=np.float32)
+        self.high = np.array([1], dtype=np.float32)
+
+    def __call__(self, env, action):
+        if self.base == "pitch_ref":
+            pitch = env.wt_sim.wt.pitch_ref
+        else:
+            pitch = env.wt_sim.x[2]
+        env.pitch_increment = action[0]*np.radians(self.rate)*env.step_time
+        new_pitch = pitch + env.pitch_increment
+        if self.clip:
+            new_pitch = np.clip(new_pitch, 0, np.pi/2)
+        return [new_pitch, env.Vx]
+
+class AbsolutePitch():
+    def __init__(self):
+        self.low = np.array([np.deg2rad(0)], dtype=np.float32)
+        self.high = np.array([np.deg2rad(90)], dtype=np.float32)
+
+    def __call__(self, env, action):
+        env.pitch_ctrl = action[0]
+        return [action[0], env.Vx]
+
+
+"""
+Wind stages: reset(env) returns the wind speed of the new episode (mean env.Vx_0). Time varying winds
+(time_varying = True) also give the wind at time t (__call__, used inside the solver) and the winds of
+the n simulation steps of a control step (window).
+cacheable = True when the burn-in only depends on the episode wind speed and the stage parameters (stage_key).
+Series winds (turbulent, bank, file) draw a new series each episode and are never served from the burn-in cache.
+"""
+class ConstantWind():
+    time_varying = False
+    cacheable = True
+
+    def reset(self, env):
+        return env.Vx_0
+
+class RandomWind():
+    time_varying = False
+    cacheable = True
+
+    def __init__(self, amplitude=0.15):
+        self.amplitude = amplitude
+
+    def reset(self, env):
+        return env.Vx_0 + np.random.uniform(-self.amplitude, self.amplitude)
+
+class SineWind():
+    time_varying = True
+    cacheable = True
+
+    def __init__(self, amplitude=0.15, frequency=0.02):
+        self.amplitude = amplitude
+        self.frequency = frequency #Hz
+        self.Vx_0 = None
+
+    def reset(self, env):
+        self.Vx_0 = env.Vx_0
+        return self(0.0)
+
+    def __call__(self, t):
+        return self.Vx_0 + np.sin(self.frequency*2*np.pi*t)*self.amplitude
+
+    #Same times as the simulator (repeated addition of dt), one vectorized np.sin
+    def window(self, t0, n, dt):
+        t = np.cumsum(np.r_[t0, np.full(n - 1, dt)])
+        return self.Vx_0 + np.sin(self.frequency*2*np.pi*t)*self.amplitude
+
+
+"""
+Reward stages: reward of the speed error reached by the action
+"""
+class SquaredErrorReward():
+    def __call__(self, env, speed_error):
+        return -(speed_error**2)
+
+#-K1*speed_error^2 - K2*|Integral(speed_error)| over integral_time seconds, K2 from 0 to 0.7 (exp_07_95)
+class IntegralErrorReward():
+    def __init__(self, integral_time=8):
+        self.integral_time = integral_time
+
+    def __call__(self, env, speed_error):
+        K2 = env.exp_07_95()
+        K1 = 1-K2
+
+        env.integral_error = env.integral_movil(self.integral_time, speed_error)
+        return -K1*(speed_error**2) - K2*np.abs(env.integral_error)
+
+
+ACTIONS = {"pitch_increment": PitchIncrement, "pitch": AbsolutePitch}
+WINDS = {"constant": ConstantWind, "random": RandomWind, "sine": SineWind, "turbulent": TurbulentWind}
+REWARDS = {"squared_error": SquaredErrorReward, "integral_error": IntegralErrorReward}
+
+#Stage given by name (default instance) or as an instance
+def make_stage(stage, stages):
+    if isinstance(stage, str):
+        if stage not in stages:
+            raise ValueError("Unknown stage {}. Available: {}".format(stage, sorted(stages)))
+        return stages[stage]()
+    return stage
+
+#Hashable description of a stage (burn-in cache key)
+def stage_key(stage):
+    return (type(stage).__name__,) + tuple(sorted((name, value) for name, value in vars(stage).items() if np.isscalar(value)))
+
+
+class SimpleWtGym(gym.Env):
+    #myLog columns (None: derived from the observations)
+    LOG_COLUMNS = None
+    #Episode variables captured by get_state/set_state (besides the simulator and np.random)
+    STATE_ATTRIBUTES = ("state", "obs", "Vx", "actions", "instant_reward", "pitch_increment", "pitch_ctrl", "error_array", "integral_error", "wind_stage")
+
+    #control_time_step: None to advance one simulation step (dt) per env step
+    #observation_bounds: {name: (low, high)} overriding the OBSERVATIONS bounds
+    #log_period: log only when time % log_period < 0.01 (None: every step)
+    def __init__(self, inputFileName="", Vx=18, wg_nom=40, t_max=40, burn_in_time=0, control_time_step=0.2,
+                 action="pitch_increment", wind="random", observations=("error_wg", "pitch", "Vx", "pitch_ref", "integral_error"),
+                 reward="integral_error", observation_bounds=None, log_columns=None, log_period=None,
+                 logging_level=logging.INFO, integrator="RK45", single_call=False, burn_in_cache=None, trim_reset=False):
+        #inputFileName: model parameters JSON (e.g. cfg/model_3_cfg.json). Empty for the default model
+        self.inputFileName = inputFileName
+        logging.debug("Initializing SimpeWTGym")
+
+        self.control_time_step = control_time_step #s
+        #Simulation parameters
+        self.Vx_0 = Vx #Mean wind speed
+        self.Vx = Vx
+        self.wg_nom = wg_nom
+        self.t_max = t_max
+        self.integrator = integrator #WindTurbineSimulator integration engine
+        self.single_call = single_call #Integrate each control step with one solver call
+        self.burn_in_time = burn_in_time
+        self.burn_in_cache = get_burn_in_cache(burn_in_cache) #Memoized burn-in (see burn_in_cache.py)
+        self.trim_reset = trim_reset #Reset to the equilibrium holding wg_nom instead of x0
+        self.error_array = None #Moving window of speed errors (RingBuffer), sized on first use
+        self.integral_error = 0
+
+        #Stages
+        self.action_stage = make_stage(action, ACTIONS)
+        self.wind_stage = make_stage(wind, WINDS)
+        self.reward_stage = make_stage(reward, REWARDS)
+        unknown = [name for name in observations if name not in OBSERVATIONS]
+        if unknown:
+            raise ValueError("Unknown observations {}. Available: {}".format(unknown, sorted(OBSERVATIONS)))
+        self.observations = tuple(observations)
+        self.observation_getters = tuple(OBSERVATIONS[name][0] for name in self.observations)
+        self.stage_key = (stage_key(self.action_stage), stage_key(self.wind_stage), self.observations, stage_key(self.reward_stage))
+        if self.burn_in_cache is not None and not getattr(self.wind_stage, "cacheable", False):
+            logging.warning("{} wind: burn-in cache disabled, the burn-in is simulated every reset".format(type(self.wind_stage).__name__))
+
+        #GYM API DEFINITION
+        bounds = dict((name, OBSERVATIONS[name][1:]) for name in self.observations)
+        bounds.update(observation_bounds or {})
+        low_obs = np.array([bounds[name][0] for name in self.observations], dtype=np.float32)
+        high_obs = np.array([bounds[name][1] for name in self.observations], dtype=np.float32)
+        self.set_spaces(self.action_stage.low, self.action_stage.high, low_obs, high_obs)
+
+        self.wt_sim = None #Built on the first reset
+
+        #Logging
+        self.enable_myLog = 1
+        self.log_period = log_period
+        self.LOG_COLUMNS = tuple(log_columns or self.LOG_COLUMNS or self.default_log_columns())
+        self.log_getters = tuple(self.log_getter(column) for column in self.LOG_COLUMNS)
+        self.myLog = ColumnarLog(self.LOG_COLUMNS)
+        self.pitch_increment = 0
+        self.pitch_ctrl = 0
+
+    def step(self, action):
+        logging.debug("Action: {}".format(action))
+        self.actions = self.map_inputs(action)
+        self.state = self.control_step(self.actions)
+        self.instant_reward = self.reward(self.state)
+        self.obs = self.map_outputs(self.state)
+        done = self.do_terminate()
+        self.log_callback()
+
+        return self.obs, self.instant_reward, done, {}
+
+    def control_step(self, actions):
+        wind = self.wind_stage
+        if self.single_call:
+            if wind.time_varying:
+                #Wind as a continuous function of time inside the solver
+                pitch_ref = actions[0]
+                state = self.wt_sim.step_interval(lambda t: [pitch_ref, wind(t)], self.sim_steps)
+                actions[1] = self.Vx = wind(self.wt_sim.ti)
+                return state
+            #Action is constant over the control step, integrate it with one solver call
+            return self.wt_sim.step_interval(actions, self.sim_steps)
+
+        #Loop during control time step
+        wt_sim = self.wt_sim
+        if wind.time_varying:
+            #Winds of the whole control step at once, updated at simulation frequency
+            for Vx in wind.window(wt_sim.ti, self.sim_steps, wt_sim.dt):
+                actions[1] = self.Vx = Vx
+                state = wt_sim.step(actions)
+            return state
+        for i in range(self.sim_steps):
+            state = wt_sim.step(actions)
+
+        return state
+
+    def reset(self):
+        logging.debug("Resetting environment.")
+        #Init Wind Turbine
+        self.init_simulator()
+        self.state = self.wt_sim.wt.x0
+        #Wind of the episode
+        self.Vx = self.wind_stage.reset(self)
+        if self.trim_reset:
+            self.apply_trim()
+        self.obs = self.map_outputs(self.state)
+
+        #After reset, run initial steps.
+        self.obs = self.run_burn_in(self.obs)
+        return self.obs
+
+    def run_burn_in(self,obs):
+        #Series winds are not cacheable: the cache key (first wind speed) does not fix the series of the episode
+        if self.burn_in_cache is not None and self.burn_in_time > 0 and getattr(self.wind_stage, "cacheable", False):
+            return self.burn_in_cache.run(self)
+        while (self.wt_sim.ti < self.burn_in_time):
+            actions = [0.0,self.Vx]
+            obs, *_ = self.step(actions)
+        return obs
+
+    #Start at the equilibrium holding wg_nom for the current wind (see WindTurbineDynamics.trim)
+    def apply_trim(self):
+        self.wt_sim.set_trim(self.Vx, w=self.wg_nom)
+        self.state = self.wt_sim.x
+
+    #Build the simulator once and keep its initial snapshot. Later resets restore it in place
+    def init_simulator(self):
+        if self.wt_sim is None:
+            self.wt_sim = WindTurbineSimulator(integrator=self.integrator, config=self.inputFileName or None)
+            self.initial_sim_state = self.wt_sim.get_state()
+            #Control period and simulation steps per env step
+            self.step_time = self.control_time_step or self.wt_sim.dt
+            self.sim_steps = int(self.step_time/self.wt_sim.dt)
+        else:
+            self.wt_sim.set_state(self.initial_sim_state)
+
+    def get_state(self):
+        return get_env_state(self, self.STATE_ATTRIBUTES)
+
+    def set_state(self, state):
+        set_env_state(self, state)
+
+    def reward(self, state):
+        speed_error = self.wg_nom - state[0]
+        return self.reward_stage(self, speed_error)
+
+    def integral_movil(self,integral_time, error):
+        Num_steps = integral_time/self.step_time
+        if self.error_array is None:
+            self.error_array = RingBuffer(np.floor(Num_steps))
+        self.error_array.append(error)
+        integral = self.error_array.sum*self.step_time
+        return integral
+
+    #Exponential function that reaches 95% of 1 in 50s
+    def exp_1_95(self):
+        T = 17.33
+        K2 = 1 - np.exp(-self.wt_sim.ti /T)
+        return K2
+
+    def exp_07_95(self):
+        T = 17.33
+        K2 = 0.7 - 0.7*np.exp(-self.wt_sim.ti /T)
+        return K2
+
+    def do_terminate(self):
+        terminate = False
+        if (self.wt_sim.ti >= self.t_max):
+            logging.info("Terminating episode. Time exceded")
+            terminate = True
+
+        return terminate
+
+    def set_spaces(self, low_action, high_action, low_obs, high_obs):
+        self.action_space = spaces.Box(
+            low=low_action,
+            high=high_action,
+            dtype=np.float32
+        )
+        self.observation_space = spaces.Box(
+            low=low_obs,
+            high=high_obs,
+            dtype=np.float32
+        )
+
+    def map_inputs(self,actions):
+        return self.action_stage(self, actions)
+
+    def map_outputs(self, outputs):
+        return [get(self, outputs) for get in self.observation_getters]
+
+    def default_log_columns(self):
+        action = "Pitch_ctrl" if isinstance(self.action_stage, AbsolutePitch) else "Pitch_increment"
+        return (("time", action) + tuple(name for name in LOG_SIGNALS if name != "power") + ("Vx", "actions.pitch")
+                + tuple("obs." + name for name in self.observations) + ("reward",))
+
+    #Value of a myLog column from the env and the WindTurbineDynamics outputs
+    def log_getter(self, column):
+        if column == "time":
+            return lambda env, outputs: env.wt_sim.ti
+        if column in ("Pitch_increment", "Pitch_ctrl", "Vx", "integral_error"):
+            name = {"Pitch_increment": "pitch_increment", "Pitch_ctrl": "pitch_ctrl"}.get(column, column)
+            return lambda env, outputs: getattr(env, name)
+        if column in LOG_SIGNALS:
+            signal = LOG_SIGNALS[column]
+            return lambda env, outputs: outputs[signal]
+        if column == "actions.pitch":
+            return lambda env, outputs: env.actions[0]
+        if column == "reward":
+            return lambda env, outputs: env.instant_reward
+        if column.startswith("obs.") and column[4:] in self.observations:
+            index = self.observations.index(column[4:])
+            return lambda env, outputs: env.obs[index]
+        raise ValueError("Unknown log column {}".format(column))
+
+    def log_callback(self):
+        if self.enable_myLog:
+            if self.log_period is None or self.wt_sim.ti % self.log_period < 0.01:
+                outputs = self.wt_sim.wt.outputs()
+                self.myLog.append(tuple(get(self, outputs) for get in self.log_getters))
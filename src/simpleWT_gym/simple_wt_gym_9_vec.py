@@ -0,0 +1,177 @@
+import logging
+
+import numpy as np
+from gym import spaces
+from gym.vector import VectorEnv
+
+from .ring_buffer import BatchRingBuffer
+from .wt_dynamics_batch import BatchWindTurbineSimulator
+
+"""
+Vectorized SimpleWtGym9. N sub-environments stepped in lockstep with one batched dynamics evaluation.
+Action: Pitch increment (normalized [-1,1]) (+Pitch_ref)
+Observations: GenSpeed error, Pitch, Wind Speed x [12,13], Pitch_ref, Integral GenSpeed error
+Rewards: -K1*speed_error^2 - K2*Integral(speed_error^2)
+Wind modified in each episode
+Finished sub-environments are reset automatically. Their last observation is in infos[i]["terminal_observation"]
+"""
+class SimpleWtGym9Vec(VectorEnv):
+    def __init__(self, num_envs, inputFileName="", Vx=18, wg_nom=40, t_max=40, burn_in_time=0, control_time_step=0.2, integrator="RK4", seed=None, trim_reset=False):
+        logging.debug("Initializing SimpeWTGym9Vec")
+
+        self.control_time_step=control_time_step #s
+        #Simulation parameters
+        self.Vx_0 = Vx # Mean wind speed (addup  random +-0.15)
+        self.wg_nom = wg_nom
+        self.t_max = t_max
+        self.burn_in_time = burn_in_time
+        self.integrator = integrator
+        self.inputFileName = inputFileName #Model parameters JSON. Empty for the default model
+        self.rng = np.random.default_rng(seed)
+        self.trim_reset = trim_reset #Reset to the equilibrium holding wg_nom instead of x0
+        self.integral_steps = int(8/self.control_time_step) #Moving integral window
+
+        #GYM API DEFINITION
+        #Action: Pitch increment (normalized)
+        low_action = np.array([-1], dtype=np.float32)
+        high_action = np.array([1], dtype=np.float32)
+        #Observations: GenSpeed error, Pitch, Wind Speed x, Pitch_ref, Integral GenSpeed error
+        low_obs = np.array([-10,0,12,0,0], dtype=np.float32)
+        high_obs = np.array([10,np.pi/2,13,np.pi/2,20], dtype=np.float32)
+        single_action_space = spaces.Box(low=low_action, high=high_action, dtype=np.float32)
+        single_observation_space = spaces.Box(low=low_obs, high=high_obs, dtype=np.float32)
+        super().__init__(num_envs, single_observation_space, single_action_space)
+        self.wt_sim = None #Built on the first reset
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=float).reshape(self.num_envs, -1)
+        obs, rewards, dones = self.batch_step(actions)
+        infos = [{} for i in range(self.num_envs)]
+
+        #Auto-reset finished sub-environments
+        done_idx = np.flatnonzero(dones)
+        if len(done_idx) > 0:
+            for i in done_idx:
+                infos[i]["terminal_observation"] = obs[i].astype(np.float32)
+            self.reset_envs(done_idx)
+
+        return self.obs.astype(np.float32), rewards, dones, infos
+
+    #Step the selected sub-environments. Reward is computed on the state reached by the action as in SimpleWtGym9
+    def batch_step(self, actions, idx=slice(None)):
+        self.actions[idx] = self.map_inputs(actions, idx)
+        state = self.control_step(self.actions[idx], idx)
+        rewards = self.reward(state, idx)
+        self.instant_reward[idx] = rewards
+        self.obs[idx] = self.map_outputs(state, idx)
+        dones = self.do_terminate(idx)
+        return self.obs[idx].copy(), rewards, dones
+
+    def control_step(self, actions, idx=slice(None)):
+        steps = self.control_time_step/self.wt_sim.dt
+
+        #Loop during control time step
+        for i in range(int(steps)):
+            state = self.wt_sim.step(actions, idx)
+
+        return state[idx]
+
+    def reset(self, seed=None, options=None):
+        logging.debug("Resetting vectorized environment.")
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        #Init Wind Turbines. Built once, later resets restore the initial snapshot in place
+        if self.wt_sim is None:
+            self.wt_sim = BatchWindTurbineSimulator(self.num_envs, integrator=self.integrator, config=self.inputFileName or None)
+            self.initial_sim_state = self.wt_sim.get_state()
+        else:
+            self.wt_sim.set_state(self.initial_sim_state)
+        self.Vx = np.zeros(self.num_envs)
+        self.error_array = BatchRingBuffer(self.num_envs, self.integral_steps)
+        self.integral_error = np.zeros(self.num_envs)
+        self.instant_reward = np.zeros(self.num_envs)
+        self.actions = np.zeros((self.num_envs, 2))
+        self.obs = np.zeros((self.num_envs, self.single_observation_space.shape[0]))
+        self.reset_envs(np.arange(self.num_envs))
+        return self.obs.astype(np.float32)
+
+    def reset_envs(self, idx):
+        self.wt_sim.reset(idx)
+        #Update wind for the episode
+        self.Vx[idx] = self.random_wind(len(idx))
+        if self.trim_reset:
+            self.wt_sim.set_trim(self.Vx[idx], w=self.wg_nom, idx=idx)
+        self.error_array.clear(idx)
+        self.integral_error[idx] = 0
+        self.obs[idx] = self.map_outputs(self.wt_sim.x[idx], idx)
+
+        #After reset, run initial steps.
+        self.run_burn_in(idx)
+
+    #Snapshot of all sub-environments (simulator, episode variables and wind generator)
+    def get_state(self):
+        return {
+            "wt_sim": self.wt_sim.get_state(),
+            "env": {name: getattr(self, name).copy() for name in ("Vx", "error_array", "integral_error", "instant_reward", "actions", "obs")},
+            "rng": self.rng.bit_generator.state,
+        }
+
+    def set_state(self, state):
+        self.wt_sim.set_state(state["wt_sim"])
+        for name, value in state["env"].items():
+            setattr(self, name, value.copy())
+        self.rng.bit_generator.state = state["rng"]
+
+    def run_burn_in(self, idx):
+        #Sub-environments reset together share the same time
+        while len(idx) > 0 and self.wt_sim.ti[idx[0]] < self.burn_in_time:
+            self.batch_step(np.zeros((len(idx),1)), idx)
+
+    def reward(self, state, idx=slice(None)):
+        speed_error = self.wg_nom - state[:,0]
+        K2 = self.exp_07_95(idx)
+        K1 = 1-K2
+
+        self.integral_error[idx] = self.integral_movil(speed_error, idx)
+        reward = -K1*(speed_error**2) - K2*np.abs(self.integral_error[idx])
+        return reward
+
+    #Moving window sum of the last integral_steps errors per sub-environment
+    def integral_movil(self, error, idx=slice(None)):
+        self.error_array.append(error, idx)
+        integral = self.error_array.sum(idx)*self.control_time_step
+        return integral
+
+    def exp_07_95(self, idx=slice(None)):
+        T = 17.33
+        K2 = 0.7 - 0.7*np.exp(-self.wt_sim.ti[idx] /T)
+        return K2
+
+    def do_terminate(self, idx=slice(None)):
+        return self.wt_sim.ti[idx] >= self.t_max
+
+    def map_inputs(self, actions, idx=slice(None)):
+        norm_delta_pitch = actions[:,0] #Norm 1 = 5 deg/s
+        #Pitch incremental inputs
+        minPitch = np.radians(0)
+        maxPitch = np.radians(90)
+        pitch_ref = self.wt_sim.pitch_ref[idx] #[rad]
+
+        pitch_increment = norm_delta_pitch*np.radians(5)*self.control_time_step # [rad] Norm 1 = 5 deg/s
+        new_pitch = np.clip(pitch_ref + pitch_increment, minPitch, maxPitch) #Clamp between min and max pitch
+
+        return np.column_stack([new_pitch, self.Vx[idx]])
+
+    def random_wind(self, n):
+        #FRandom value between min and max
+        return self.Vx_0 + self.rng.uniform(-0.15,0.15,n)
+
+    def map_outputs(self, outputs, idx=slice(None)):
+        wg = outputs[:,0]
+        error_wg = self.wg_nom-wg
+        pitch = outputs[:,2]
+        Vx = self.Vx[idx]
+        pitch_ref = self.wt_sim.pitch_ref[idx]
+        integral_error_wg = self.integral_error[idx]
+
+        return np.column_stack([error_wg,pitch,Vx,pitch_ref,integral_error_wg])
@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+
+"""
+Turbulent longitudinal wind by FFT spectral synthesis.
+A whole series is generated at once: random phases on the one-sided spectrum S(f) and one inverse real FFT,
+    u(t) = mean + sum_k sqrt(2 S(f_k) df) cos(2 pi f_k t + phase_k)
+Spectra (IEC 61400-1, sigma = turbulence_intensity*mean_speed):
+    kaimal       S(f) = sigma^2 4 L/V / (1 + 6 f L/V)^(5/3)          L = 8.1*42 m
+    von_karman   S(f) = sigma^2 4 L/V / (1 + 70.8 (f L/V)^2)^(5/6)   L = 3.5*42 m
+TurbulentWind is the gym wind stage: one series per episode sampled at the simulator dt, looked up by index.
+Usage:
+    wind = turbulent_wind(12.5, 0.1, duration=600, dt=0.05, seed=1)
+    env = SimpleWtGym(Vx=12.5, wind=TurbulentWind(turbulence_intensity=0.1, spectrum="von_karman"))
+"""
+
+def kaimal_spectrum(f, mean_speed, sigma, length_scale):
+    x = length_scale/mean_speed
+    return sigma**2*4*x/(1 + 6*f*x)**(5/3)
+
+def von_karman_spectrum(f, mean_speed, sigma, length_scale):
+    x = length_scale/mean_speed
+    return sigma**2*4*x/(1 + 70.8*(f*x)**2)**(5/6)
+
+#Spectrum function and default integral length scale [m] (hub height above 60 m)
+SPECTRA = {
+    "kaimal": (kaimal_spectrum, 8.1*42),
+    "von_karman": (von_karman_spectrum, 3.5*42),
+}
+
+
+#Wind series [m/s] of duration [s] sampled every dt [s] (ceil(duration/dt) + 1 samples, first at t=0)
+#seed: int or np.random.Generator. None uses the np.random global state
+#normalize: scale the fluctuation to the exact standard deviation sigma (finite series lose low frequencies)
+def turbulent_wind(mean_speed, turbulence_intensity, duration, dt, spectrum="kaimal", length_scale=None, seed=None, normalize=True):
+    if spectrum not in SPECTRA:
+        raise ValueError("Unknown wind spectrum {}. Available: {}".format(spectrum, sorted(SPECTRA)))
+    spectrum_function, default_length_scale = SPECTRA[spectrum]
+    if length_scale is None:
+        length_scale = default_length_scale
+    if seed is None:
+        rng = np.random
+    elif isinstance(seed, np.random.Generator):
+        rng = seed
+    else:
+        rng = np.random.default_rng(seed)
+
+    n = int(math.ceil(duration/dt)) + 1
+    sigma = turbulence_intensity*mean_speed
+    f = np.fft.rfftfreq(n, dt)[1:]
+    df = 1/(n*dt)
+    amplitude = np.sqrt(2*spectrum_function(f, mean_speed, sigma, length_scale)*df)
+    phases = rng.uniform(0, 2*np.pi, len(f))
+
+    #irfft(c)_j = (c_0 + 2 Re sum c_k exp(2 pi i k j/n))/n
+    coefficients = np.zeros(len(f) + 1, dtype=complex)
+    coefficients[1:] = 0.5*n*amplitude*np.exp(1j*phases)
+    if n % 2 == 0:
+        coefficients[-1] = 0 #Nyquist term has no phase freedom
+    fluctuation = np.fft.irfft(coefficients, n)
+    if normalize and sigma > 0:
+        fluctuation *= sigma/fluctuation.std()
+    return mean_speed + fluctuation
+
+
+"""
+Gym wind stage (see simple_wt_gym.py) for a series precomputed at reset() at the simulator dt.
+The control loop takes its winds with window() (slice of the series), the single solver call
+interpolates it linearly. Past the end the last sample is held.
+"""
+class SeriesWind():
+    time_varying = True
+    cacheable = False
+
+    def __init__(self):
+        self.series = None
+        self.dt = None
+
+    def __call__(self, t):
+        position = min(max(t/self.dt, 0.0), len(self.series) - 1.0)
+        i = min(int(position), len(self.series) - 2)
+        return self.series[i] + (self.series[i+1] - self.series[i])*(position - i)
+
+    #Winds of the n simulation steps starting at t0
+    def window(self, t0, n, dt):
+        i0 = int(round(t0/self.dt))
+        if i0 + n <= len(self.series):
+            return self.series[i0:i0+n]
+        return self.series[np.minimum(np.arange(i0, i0 + n), len(self.series) - 1)]
+
+#One turbulent_wind series per episode (t_max plus one control step) around env.Vx_0
+class TurbulentWind(SeriesWind):
+    def __init__(self, turbulence_intensity=0.1, spectrum="kaimal", length_scale=None, seed=None):
+        super().__init__()
+        self.turbulence_intensity = turbulence_intensity
+        self.spectrum = spectrum
+        self.length_scale = length_scale
+        #Own generator with a seed (snapshotted with the stage), np.random global state otherwise
+        self.rng = None if seed is None else np.random.default_rng(seed)
+
+    def reset(self, env):
+        self.dt = env.wt_sim.dt
+        duration = env.t_max + env.step_time
+        self.series = turbulent_wind(env.Vx_0, self.turbulence_intensity, duration, self.dt, spectrum=self.spectrum,
+                                     length_scale=self.length_scale, seed=self.rng)
+        return self.series[0]
@@ -0,0 +1,181 @@
+import argparse
+import logging
+import os
+
+import numpy as np
+
+from .turbulent_wind import turbulent_wind
+
+"""
+Wind scenario bank: many wind series in one binary file, memory-mapped read-only.
+All envs and processes opening the same bank share the OS page cache, nothing is copied or parsed.
+Layout (little endian):
+    header      HEADER_DTYPE: magic, version, count, dt [s], total samples
+    index       INDEX_DTYPE x count: first sample, length, mean speed, turbulence intensity
+    samples     float32 x total samples [m/s]
+Every scenario has at least 2 samples (the stage interpolates between consecutive samples).
+WindBank pickles (and deepcopies) as its path, so env snapshots and worker processes reopen it.
+Build from the command line:
+    python -m simpleWT_gym.wind_bank build Logs/wind_bank.bin --scenarios 1000 --duration 660 --dt 0.05 --mean-speed 12 13
+    python -m simpleWT_gym.wind_bank info Logs/wind_bank.bin
+"""
+
+MAGIC = b"WTWBANK1"
+VERSION = 1
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("count", "<u4"), ("dt", "<f8"), ("samples", "<u8")])
+INDEX_DTYPE = np.dtype([("start", "<u8"), ("length", "<u8"), ("mean_speed", "<f4"), ("turbulence_intensity", "<f4")])
+
+
+#Write a bank with the given series (iterable of 1D arrays, all sampled every dt). Returns the number of scenarios
+#metadata: optional (mean_speed, turbulence_intensity) per series
+def write_wind_bank(path, series, dt, metadata=None):
+    series = [np.asarray(values, dtype=np.float32) for values in series]
+    index = np.zeros(len(series), dtype=INDEX_DTYPE)
+    lengths = np.array([len(values) for values in series], dtype=np.uint64)
+    short = np.flatnonzero(lengths < 2)
+    if len(short):
+        raise ValueError("Wind bank scenarios need at least 2 samples: scenario {} has {}".format(short[0], lengths[short[0]]))
+    index["length"] = lengths
+    index["start"] = np.cumsum(lengths) - lengths
+    if metadata is not None:
+        index["mean_speed"], index["turbulence_intensity"] = np.asarray(metadata, dtype=np.float32).T
+    else:
+        index["mean_speed"] = [values.mean() for values in series]
+        index["turbulence_intensity"] = [values.std()/values.mean() for values in series]
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["count"] = len(series)
+    header["dt"] = dt
+    header["samples"] = lengths.sum()
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(header.tobytes())
+        file.write(index.tobytes())
+        for values in series:
+            file.write(values.tobytes())
+    os.replace(temporary, path) #Readers never see a partial bank
+    return len(series)
+
+#Bank of turbulent_wind series. Mean speeds uniform in mean_speed (low, high), one seed for the whole bank
+def build_wind_bank(path, scenarios, duration, dt, mean_speed=(12, 13), turbulence_intensity=0.1, spectrum="kaimal", seed=0):
+    rng = np.random.default_rng(seed)
+    mean_speeds = rng.uniform(mean_speed[0], mean_speed[1], scenarios)
+    series = (turbulent_wind(speed, turbulence_intensity, duration, dt, spectrum=spectrum, seed=rng) for speed in mean_speeds)
+    metadata = [(speed, turbulence_intensity) for speed in mean_speeds]
+    return write_wind_bank(path, series, dt, metadata)
+
+
+class WindBank():
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header["magic"][0] != MAGIC:
+            raise ValueError("{} is not a wind bank".format(path))
+        if header["version"][0] != VERSION:
+            raise ValueError("{}: unsupported wind bank version {}".format(path, header["version"][0]))
+        self.dt = float(header["dt"][0])
+        count = int(header["count"][0])
+        self.index = np.memmap(path, dtype=INDEX_DTYPE, mode="r", offset=HEADER_DTYPE.itemsize, shape=(count,))
+        self.samples = np.memmap(path, dtype=np.float32, mode="r", offset=HEADER_DTYPE.itemsize + INDEX_DTYPE.itemsize*count,
+                                 shape=(int(header["samples"][0]),))
+        if count and self.index["length"].min() < 2:
+            raise ValueError("{}: wind bank scenarios need at least 2 samples".format(path))
+
+    def __len__(self):
+        return len(self.index)
+
+    #Read-only view of the samples of scenario i (no copy)
+    def scenario(self, i):
+        start, length = int(self.index["start"][i]), int(self.index["length"][i])
+        return self.samples[start:start+length]
+
+    def info(self):
+        return {"path": self.path, "scenarios": len(self), "dt": self.dt, "samples": len(self.samples),
+                "mean_speed": (float(self.index["mean_speed"].min()), float(self.index["mean_speed"].max())) if len(self) else None}
+
+    #Reopened from the path in other processes and in deepcopies (env snapshots)
+    def __reduce__(self):
+        return (WindBank, (self.path,))
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+"""
+Gym wind stage (see simple_wt_gym.py) replaying bank scenarios. reset() draws a scenario index with np.random
+(or takes the next one of scenarios) and the winds are interpolated linearly from the bank samples at the
+simulator times. Past the end of the scenario its last sample is held.
+"""
+class BankWind():
+    time_varying = True
+    cacheable = False
+
+    #bank: WindBank or path. scenarios: indices to draw from (None: all)
+    def __init__(self, bank, scenarios=None):
+        self.bank = bank if isinstance(bank, WindBank) else WindBank(bank)
+        self.scenarios = None if scenarios is None else np.asarray(scenarios, dtype=int)
+        self.scenario = None
+        self.samples = None
+
+    def reset(self, env):
+        candidates = len(self.bank) if self.scenarios is None else len(self.scenarios)
+        k = np.random.randint(candidates)
+        self.scenario = int(k if self.scenarios is None else self.scenarios[k])
+        self.samples = self.bank.scenario(self.scenario)
+        return float(self.samples[0])
+
+    def __call__(self, t):
+        position = min(max(t/self.bank.dt, 0.0), len(self.samples) - 1.0)
+        i = min(int(position), len(self.samples) - 2)
+        return float(self.samples[i]) + float(self.samples[i+1] - self.samples[i])*(position - i)
+
+    #Winds of the n simulation steps starting at t0 (one vectorized interpolation on the needed samples only)
+    def window(self, t0, n, dt):
+        t = np.cumsum(np.r_[t0, np.full(n - 1, dt)])
+        first = min(int(t[0]/self.bank.dt), len(self.samples) - 1)
+        last = min(int(t[-1]/self.bank.dt) + 2, len(self.samples))
+        return np.interp(t, self.bank.dt*np.arange(first, last), self.samples[first:last])
+
+    #The view on the bank is not copied with the env snapshot
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["samples"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.scenario is not None:
+            self.samples = self.bank.scenario(self.scenario)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="python -m simpleWT_gym.wind_bank", description="Build or inspect a memory-mapped wind scenario bank")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Generate turbulent wind scenarios (FFT synthesis)")
+    build.add_argument("path")
+    build.add_argument("--scenarios", type=int, default=100)
+    build.add_argument("--duration", type=float, default=60.0, help="Scenario length [s]")
+    build.add_argument("--dt", type=float, default=0.05, help="Sample time [s]")
+    build.add_argument("--mean-speed", type=float, nargs=2, default=(12.0, 13.0), metavar=("LOW", "HIGH"), help="Uniform range of mean speeds [m/s]")
+    build.add_argument("--ti", type=float, default=0.1, help="Turbulence intensity")
+    build.add_argument("--spectrum", default="kaimal", choices=("kaimal", "von_karman"))
+    build.add_argument("--seed", type=int, default=0)
+    info = commands.add_parser("info", help="Print the bank header")
+    info.add_argument("path")
+    args = parser.parse_args(args)
+
+    if args.command == "build":
+        count = build_wind_bank(args.path, args.scenarios, args.duration, args.dt, mean_speed=args.mean_speed,
+                                turbulence_intensity=args.ti, spectrum=args.spectrum, seed=args.seed)
+        logging.info("Wrote {} scenarios to {}".format(count, args.path))
+    print(WindBank(args.path).info())
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
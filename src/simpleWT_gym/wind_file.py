@@ -0,0 +1,220 @@
+import io
+import logging
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .turbulent_wind import SeriesWind
+
+"""
+Measured wind records (met mast, SCADA...) read lazily from large files.
+Formats:
+    csv     delimited text, optional header line. Time column in seconds (or none and a fixed dt)
+    binary  raw little endian float32 records of 1 (speed, fixed dt) or 2 (time, speed) columns (.bin, .f32).
+            float32 times lose resolution on long records (4 ms at 14 h): prefer a fixed dt or npy
+    npy     numpy array (n,) or (n, 2) of any float type, memory-mapped
+The file is split in chunks of chunk_rows records. A chunk index (byte offset and first time of each chunk)
+is built once with a block scan and cached per (path, modification time). Reads parse only the chunks
+covering the requested interval, with a small LRU cache of parsed chunks, so the file is never loaded whole.
+resample() interpolates the record linearly at any time step in one vectorized np.interp.
+Usage:
+    source = WindFile("data/mast.csv", time_column="time", speed_column="ws_hub")
+    winds = source.resample(3600, 600, sim.dt)                  #WindTurbineSimulator input, 10 min from t=1h
+    env = SimpleWtGym(wind=FileWind(source))                    #Random episode windows
+"""
+
+FORMATS = {".csv": "csv", ".txt": "csv", ".dat": "csv", ".bin": "binary", ".f32": "binary", ".npy": "npy"}
+SCAN_BLOCK_BYTES = 1 << 24
+
+_CHUNK_INDEXES = {}
+
+
+class WindFile():
+    #time_column/speed_column: name (csv with header) or column number. time_column None: samples every dt [s]
+    #binary_columns: 1 (speed) or 2 (time, speed) for raw binary files
+    def __init__(self, path, time_column=0, speed_column=1, dt=None, fmt=None, delimiter=",", binary_columns=2,
+                 chunk_rows=16384, cached_chunks=8):
+        self.path = path
+        self.fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+        if self.fmt not in ("csv", "binary", "npy"):
+            raise ValueError("Unknown wind file format for {}".format(path))
+        self.delimiter = delimiter
+        self.chunk_rows = chunk_rows
+        self.cached_chunks = cached_chunks
+        self.chunks = OrderedDict()
+        self.dt = dt
+
+        if self.fmt == "csv":
+            self.header = self.read_header()
+            self.time_column = self.column_number(time_column) if time_column is not None else None
+            self.speed_column = self.column_number(speed_column)
+            key = (os.path.realpath(path), os.path.getmtime(path), chunk_rows, self.delimiter, self.time_column)
+            if key not in _CHUNK_INDEXES:
+                _CHUNK_INDEXES[key] = self.scan_csv()
+            self.offsets, self.rows = _CHUNK_INDEXES[key]
+        else:
+            if self.fmt == "npy":
+                self.records = np.load(path, mmap_mode="r")
+            else:
+                self.records = np.memmap(path, dtype="<f4", mode="r")
+                if binary_columns == 2:
+                    self.records = self.records[:len(self.records)//2*2].reshape(-1, 2)
+            if self.records.ndim == 1:
+                self.time_column = None
+                self.speed_column = 0
+            else:
+                self.time_column = 0
+                self.speed_column = 1
+            self.rows = len(self.records)
+        if self.time_column is None and dt is None:
+            raise ValueError("{}: dt is needed without a time column".format(path))
+
+        #First time of each chunk (and of the last record) for the chunk lookup
+        starts = np.arange(0, self.rows, chunk_rows)
+        if self.time_column is None:
+            self.chunk_times = starts*dt
+            self.end_time = (self.rows - 1)*dt
+        else:
+            self.chunk_times = np.array([self.chunk_first_time(i) for i in range(len(starts))])
+            self.end_time = float(self.load_chunk(len(starts) - 1)[0][-1])
+        self.start_time = float(self.chunk_times[0])
+
+    def read_header(self):
+        with open(self.path, "rb") as file:
+            line = file.readline().decode().strip()
+        try:
+            [float(value) for value in line.split(self.delimiter)]
+            return None
+        except ValueError:
+            return [name.strip() for name in line.split(self.delimiter)]
+
+    def column_number(self, column):
+        if isinstance(column, str):
+            if self.header is None or column not in self.header:
+                raise ValueError("{}: no column {}".format(self.path, column))
+            return self.header.index(column)
+        return column
+
+    #Byte offset of every chunk_rows-th data line, found on raw blocks (np.flatnonzero of the newlines).
+    #Only the chunk offsets are kept, not the line offsets
+    def scan_csv(self):
+        logging.info("Indexing wind file {}".format(self.path))
+        with open(self.path, "rb") as file:
+            if self.header is not None:
+                file.readline()
+            position = file.tell()
+            offsets = [np.array([position], dtype=np.int64)]
+            started = 1 #Lines started so far (the first one at position)
+            ends_with_newline = False
+            while True:
+                block = file.read(SCAN_BLOCK_BYTES)
+                if not block:
+                    break
+                starts = position + np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord("\n")) + 1
+                numbers = started + np.arange(len(starts))
+                offsets.append(starts[numbers % self.chunk_rows == 0])
+                started += len(starts)
+                position += len(block)
+                ends_with_newline = block.endswith(b"\n")
+        offsets = np.concatenate(offsets)
+        rows = started - 1 if ends_with_newline else started
+        offsets = np.append(offsets[offsets < position], position)
+        if rows == 0 or len(offsets) < 2:
+            raise ValueError("{}: no wind records".format(self.path))
+        return offsets, rows
+
+    def chunk_first_time(self, i):
+        if self.fmt == "csv":
+            with open(self.path, "rb") as file:
+                file.seek(self.offsets[i])
+                return float(file.readline().decode().split(self.delimiter)[self.time_column])
+        return float(self.records[i*self.chunk_rows, self.time_column])
+
+    #(times, speeds) of chunk i as float64 arrays
+    def load_chunk(self, i):
+        if i in self.chunks:
+            self.chunks.move_to_end(i)
+            return self.chunks[i]
+        if self.fmt == "csv":
+            with open(self.path, "rb") as file:
+                file.seek(self.offsets[i])
+                text = file.read(int(self.offsets[i+1] - self.offsets[i])).decode()
+            columns = [self.speed_column] if self.time_column is None else [self.time_column, self.speed_column]
+            values = np.loadtxt(io.StringIO(text), delimiter=self.delimiter, usecols=columns, ndmin=2)
+        else:
+            values = np.asarray(self.records[i*self.chunk_rows:(i + 1)*self.chunk_rows], dtype=float)
+            values = values.reshape(len(values), -1)
+        if self.time_column is None:
+            chunk = (self.dt*np.arange(i*self.chunk_rows, i*self.chunk_rows + len(values)), values[:,0])
+        else:
+            chunk = (values[:,0], values[:,-1])
+        self.chunks[i] = chunk
+        if len(self.chunks) > self.cached_chunks:
+            self.chunks.popitem(last=False)
+        return chunk
+
+    #Records around [t0, t1] (one before and one after when they exist), reading only their chunks
+    def read(self, t0, t1):
+        first = max(np.searchsorted(self.chunk_times, t0, side="right") - 1, 0)
+        last = max(np.searchsorted(self.chunk_times, t1, side="right") - 1, 0)
+        chunks = [self.load_chunk(i) for i in range(first, last + 1)]
+        if chunks[-1][0][-1] < t1 and last + 1 < len(self.chunk_times):
+            chunks.append(self.load_chunk(last + 1))
+        times = np.concatenate([chunk[0] for chunk in chunks])
+        speeds = np.concatenate([chunk[1] for chunk in chunks])
+        return times, speeds
+
+    #Wind at t0 + k*dt, k = 0..ceil(duration/dt), linearly interpolated (ends held)
+    def resample(self, t0, duration, dt):
+        n = int(np.ceil(duration/dt)) + 1
+        t = t0 + dt*np.arange(n)
+        times, speeds = self.read(t[0], t[-1])
+        return np.interp(t, times, speeds)
+
+    def __len__(self):
+        return self.rows
+
+    #Open files are not copied with env snapshots nor pickled with their chunks
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["chunks"] = OrderedDict()
+        if self.fmt != "csv":
+            state["records"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.fmt == "npy":
+            self.records = np.load(self.path, mmap_mode="r")
+        elif self.fmt == "binary":
+            records = np.memmap(self.path, dtype="<f4", mode="r")
+            self.records = records if self.time_column is None else records[:len(records)//2*2].reshape(-1, 2)
+
+
+"""
+Gym wind stage (see simple_wt_gym.py) replaying a WindFile. Each episode starts at a random time of the record
+(np.random, uniform over the times leaving a whole episode) or at offset, and its t_max plus one control step
+are resampled at the simulator dt in reset().
+"""
+class FileWind(SeriesWind):
+    #source: WindFile or path (csv with time in column 0 and speed in column 1)
+    def __init__(self, source, offset=None):
+        super().__init__()
+        self.source = source if isinstance(source, WindFile) else WindFile(source)
+        self.offset = offset
+        self.start = None
+
+    def reset(self, env):
+        self.dt = env.wt_sim.dt
+        duration = env.t_max + env.step_time
+        if self.offset is not None:
+            self.start = self.source.start_time + self.offset
+        else:
+            latest = max(self.source.end_time - duration, self.source.start_time)
+            self.start = np.random.uniform(self.source.start_time, latest)
+        self.series = self.source.resample(self.start, duration, self.dt)
+        return self.series[0]
@@ -1,91 +1,187 @@
 import logging
 
 import numpy as np
-import scipy.signal as signal
-from scipy.integrate import odeint, solve_ivp
+
+from .cp_table import CpTable, get_cp_table
+from .integrators import make_integrator
+from .model_config import load_model_config
+from .recorder import ColumnarLog
 
 class WindTurbineSimulator():
-    def __init__(self):
+    #myLog columns
+    LOG_COLUMNS = ("time", "Cp", "Lambda_i", "Lambda", "Tem", "Tm", "Ia", "Ea", "w", "pitch", "dpitch", "pitch_ref", "power")
+    #WindTurbineDynamics signals logged after time
+    LOG_SIGNALS = ("Cp", "Lambda_i", "Labmda", "Tem", "Tm", "Ia", "Ea", "w", "pitch", "dptich", "pitch_ref", "power")
+
+    def __init__(self, integrator="RK45", reduced_order=False, cp_table=None, config=None):
         logging.info("Wind turbine simulator initialized")
         self.dt = 0.01           #Simulation time step [s]
-        self.wt = WindTurbineDynamics()
+        self.wt = WindTurbineDynamics(reduced_order=reduced_order, cp_table=cp_table, config=config)
         self.x = self.wt.x0     #Initial state
         self.ti=0.0             #Initial time
+        self.integrator = make_integrator(integrator, self.dt, model=self.wt) #Integration engine (RK45, RK4, Heun, Euler, BDF, ETD2...)
 
         # Logging
         self.enable_myLog = 0
-        self.myLog = []
+        self.myLog = ColumnarLog(self.LOG_COLUMNS)
 
     def step(self,u):
         tf = self.ti + self.dt
-        solution = solve_ivp(self.wt.wind_turbine_ode, [self.ti,tf], self.x, method='RK45', args=(u,))
-        self.x = [state_vec[-1] for state_vec in solution.y] #States
-        logging.debug("Solver finished with success: {}".format(solution.success))
-        if solution.success==False:
-            logging.error("Solver failed. Stopping simulation.")
+        self.x = self.integrator.integrate(self.wt.wind_turbine_ode, self.ti, tf, self.x, args=(u,)) #States
+        self.wt.set_operating_point(self.x, u)
         self.log_callback()
         self.ti = tf
         return self.x
+
+    #Integrate a whole interval of n*dt with one solver call and constant (or time function) input.
+    #u: [pitch_ref, wind] or a function u(t) returning it
+    #10ms samples are taken from the solver dense output only when myLog is enabled
+    def step_interval(self,u,n):
+        t0 = self.ti
+        tf = self.ti + n*self.dt
+        if callable(u):
+            u_t = u
+        else:
+            u_t = lambda t: u
+        ode = lambda t, x: self.wt.wind_turbine_ode(t, x, u_t(t))
+        jac = lambda t, x: self.wt.wind_turbine_jac(t, x, u_t(t)) #Implicit engines
+
+        if self.enable_myLog:
+            t_eval = t0 + self.dt*np.arange(1,n+1)
+            self.x, samples = self.integrator.integrate_dense(ode, t0, tf, self.x, t_eval, jac=jac)
+            #Logging signals of all samples in one vectorized evaluation
+            if callable(u):
+                inputs = np.array([u_t(t) for t in t_eval], dtype=float)
+            else:
+                inputs = np.broadcast_to(np.asarray(u, dtype=float), (n,2))
+            outputs = self.wt.wind_turbine_outputs(samples, inputs)
+            rows = np.column_stack([t0 + self.dt*np.arange(n)] + [outputs[signal] for signal in self.LOG_SIGNALS])
+            self.myLog.extend(rows)
+        elif callable(u):
+            self.x = self.integrator.integrate(ode, t0, tf, self.x, jac=jac)
+        else:
+            #Constant input: the model RHS as in step() (compiled engines replace it by their kernel)
+            self.x = self.integrator.integrate(self.wt.wind_turbine_ode, t0, tf, self.x, args=(u,))
+        self.wt.set_operating_point(self.x, u_t(tf))
+        self.ti = tf
+        return self.x
     
+    #Start from the equilibrium for the wind speed at the given pitch. With w, the pitch holding that rotor
+    #speed is used instead (see WindTurbineDynamics.trim_pitch)
+    def set_trim(self, wind, pitch=0.0, w=None):
+        if w is not None:
+            pitch = float(self.wt.trim_pitch(wind, w, saturate=True))
+        self.x = self.wt.trim(wind, pitch)
+        self.wt.set_operating_point(self.x, [pitch, wind])
+        self.integrator.reset()
+
+    #Snapshot of the simulation: state, time and last input (pitch_ref)
+    def get_state(self):
+        return {
+            "x": np.array(self.x, dtype=float),
+            "ti": self.ti,
+            "u": np.array(self.wt.u_op, dtype=float),
+            "outputs": self.wt._outputs,
+        }
+
+    #Restore a get_state() snapshot in place. The integrator starts again from it
+    def set_state(self, state):
+        self.x = state["x"].copy()
+        self.ti = state["ti"]
+        self.wt.set_operating_point(self.x, state["u"].copy())
+        self.wt._outputs = state["outputs"]
+        self.integrator.reset()
+
+    #Solver statistics of the last step (nfev, naccepted, nrejected)
+    @property
+    def solver_stats(self):
+        return self.integrator.last_stats
+
     def log_callback(self):
         if self.enable_myLog:
             #if self.ti % 0.1 < 0.01:                
-            self.myLog.append({
-                "time": self.ti,
-                "Cp": self.wt.Cp,
-                "Lambda_i": self.wt.Lambda_i,
-                "Lambda": self.wt.Labmda,
-                "Tem": self.wt.Tem,
-                "Tm": self.wt.Tm,
-                "Ia": self.wt.Ia,
-                "Ea": self.wt.Ea,
-                "w": self.wt.w,
-                "pitch": self.wt.pitch,
-                "dpitch": self.wt.dptich,
-                "pitch_ref": self.wt.pitch_ref,
-                "power": self.wt.power
-            })
+            outputs = self.wt.outputs()
+            self.myLog.append((self.ti,) + tuple(outputs[signal] for signal in self.LOG_SIGNALS))
+
+#Logging signal of WindTurbineDynamics, computed on demand at the last accepted operating point
+def output_signal(name):
+    return property(lambda self: self.outputs()[name])
 
 class WindTurbineDynamics():
-    def __init__(self):
+    Cp = output_signal("Cp")
+    Lambda_i = output_signal("Lambda_i")
+    Labmda = output_signal("Labmda")
+    Tem = output_signal("Tem")
+    Tm = output_signal("Tm")
+    Ia = output_signal("Ia")
+    Ea = output_signal("Ea")
+    w = output_signal("w")
+    pitch = output_signal("pitch")
+    dptich = output_signal("dptich")
+    power = output_signal("power")
+
+    #reduced_order: Ia solved algebraically from Ea(w) (quasi steady state). Leaves a non-stiff system
+    #cp_table: None for the analytic Cp, "linear"/"cubic" (or True) for a cached Cp(lambda, pitch) table, or a CpTable
+    #config: model parameters. None for the default model, a dict or a JSON file path (see model_config.py)
+    def __init__(self, reduced_order=False, cp_table=None, config=None):
         logging.info("Wind turbine parameters initialized")
-        self.c1 = 0.73              #Cp coefficients []
-        self.c2 = 151
-        self.c3 = 0.58
-        #self.c3 = 10 #Lets hack this shit to make it more pitch dependent
-        self.c4 = 0.002
-        self.c5 = 2.14
-        self.c6 = 13.2
-        self.c7 = 18.4
-        self.c8 = -0.02
-        self.c9 = -0.003
-        self.rho = 1.223            #Air density [kg/m^3]
-        self.R = 3.2*0.98           #Rotor radius [m]
-        self.A =  np.pi*self.R**2   #Rotor area [m^2]
-        self.rotor = RotorDynamics()
+        self.config = load_model_config(config)
+        self.reduced_order = reduced_order
+        parameters = self.config["WindTurbine"]
+        self.c1 = parameters["c1"]              #Cp coefficients []
+        self.c2 = parameters["c2"]
+        self.c3 = parameters["c3"]
+        self.c4 = parameters["c4"]
+        self.c5 = parameters["c5"]
+        self.c6 = parameters["c6"]
+        self.c7 = parameters["c7"]
+        self.c8 = parameters["c8"]
+        self.c9 = parameters["c9"]
+        self.rho = parameters["rho"]            #Air density [kg/m^3]
+        self.R = parameters["R"]                #Rotor radius [m]
+        self.A =  np.pi*self.R**2               #Rotor area [m^2]
+        self.half_rho_A = 0.5*self.rho*self.A   #Tm = Cp*half_rho_A*v^3/w
+        self.cp_table = None
+        if isinstance(cp_table, CpTable):
+            self.cp_table = cp_table
+        elif cp_table:
+            self.cp_table = get_cp_table(self, method="linear" if cp_table is True else cp_table)
+        self.rotor = RotorDynamics(self.config)
+        self.tao_pitch = self.config["PitchActuator"]["tao"]                        #Pitch actuator time constant [s]
+        self.max_dpitch = np.radians(self.config["PitchActuator"]["max_rate"])     #Pitch rate limit [rad/s]
 
         logging.info("Wind turbine initial state")
-        #self.w0 = 200*2*np.pi/60               #Initial rotor speed [rad/s]
-        self.w0 = 40
-        self.Ia0 = 30            #Initial armature current [A]
-        #self.pitch0 = np.deg2rad(15.55)             #Initial pitch angle [rad]
-        self.pitch0 = 0
-        self.dpitchdt0 = 0          #Initial pitch angular speed [rad/s]
+        initial_state = self.config["InitialState"]
+        self.w0 = initial_state["w0"]                   #Initial rotor speed [rad/s]
+        self.Ia0 = initial_state["Ia0"]                 #Initial armature current [A]
+        self.pitch0 = initial_state["pitch0"]           #Initial pitch angle [rad]
+        self.dpitchdt0 = initial_state["dpitchdt0"]     #Initial pitch angular speed [rad/s]
+        if self.reduced_order:
+            #Start on the slow manifold
+            self.Ia0 = self.rotor.Ia_qss(self.rotor.Ea(self.w0))
         self.x0 = [self.w0,self.Ia0,self.pitch0,self.dpitchdt0]
 
-        #Logging signals
-        self.Cp = 0
-        self.Lambda_i = 0
-        self.Labmda = 0
-        self.Tem = 0
-        self.Tm = 0
-        self.Ia = self.Ia0
-        self.Ea = 0
-        self.w = self.w0
-        self.pitch = self.pitch0
-        self.dptich = 0
-        self.pitch_ref = self.pitch0
-        self.power = 0
+        #Operating point of the logging signals (last accepted state and input)
+        self.x_op = np.array(self.x0, dtype=float)
+        self.u_op = np.array([self.pitch0, 0.0])
+        self._outputs = {"Cp": 0, "Lambda_i": 0, "Labmda": 0, "Tem": 0, "Tm": 0, "Ia": self.Ia0, "Ea": 0,
+                         "w": self.w0, "pitch": self.pitch0, "dptich": 0, "pitch_ref": self.pitch0, "power": 0}
+
+    #Last commanded pitch. Read every control step by the gyms, so it skips the output evaluation
+    @property
+    def pitch_ref(self):
+        return self.u_op[0]
+
+    #Called by the simulator with the accepted state after each step
+    def set_operating_point(self,x,u):
+        self.x_op = x
+        self.u_op = np.asarray(u, dtype=float)
+        self._outputs = None
+
+    def outputs(self):
+        if self._outputs is None:
+            self._outputs = self.wind_turbine_outputs(self.x_op, self.u_op)
+        return self._outputs
 
     # Wind turbine dynamics. System with all equations
     def wind_turbine_ode(self,t,x,u):
@@ -110,37 +206,171 @@ class WindTurbineDynamics():
         [dpitchdt, d2pitchd2t] = self.pitch_actuator_ode_1st_order([pitch,dpitchdt],[pitch_ref])
 
 
-        lambda_i = self.lambda_i(tip_speed_ratio, pitch)
-        Cp = self.c_p(lambda_i,pitch)
+        if self.cp_table is None:
+            Cp = self.c_p(self.lambda_i(tip_speed_ratio, pitch),pitch)
+        else:
+            Cp = self.cp_table(tip_speed_ratio, pitch)
         Tm = self.tm(Cp,wind_speed,w)
         #Rotor dynamics
-        Tem = self.rotor.tem(Ia)
         Ea = self.rotor.Ea(w)
-        dIadt = self.rotor.Ia_ode([Ia],[Ea])
+        if self.reduced_order:
+            #Singular perturbation. No electrical transient, Ia follows Ea
+            Ia = self.rotor.Ia_qss(Ea)
+        Tem = self.rotor.tem(Ia)
         dwdt = self.rotor.w_ode([w],[Tm,Tem])
-        power = self.rotor.power(Ia)
-
-        #Log variables
-        self.Cp = Cp
-        self.Lambda_i = lambda_i
-        self.Labmda = tip_speed_ratio
-        self.Tem = Tem
-        self.Tm = Tm
-        self.Ia = Ia
-        self.Ea = Ea
-        self.w = w
-        self.pitch = pitch 
-        self.dptich = dpitchdt
-        self.pitch_ref = pitch_ref
-        self.power = power
+        if self.reduced_order:
+            #Keep the Ia state on the algebraic solution: dIa/dt = Kg*Kphi/(Ra+Rl)*dw/dt
+            dIadt = self.rotor.Ia_qss(self.rotor.Ea(dwdt))*(w == x[0])
+        else:
+            dIadt = self.rotor.Ia_ode([Ia],[Ea])
 
         #Return all ODEs derivatives
         dxdt = [dwdt,dIadt,dpitchdt,d2pitchd2t]
         return dxdt
+
+    #Derived signals at a state x (4,) or (N,4) and input u (2,) or (N,2). Same equations as wind_turbine_ode
+    def wind_turbine_outputs(self,x,u):
+        x = np.asarray(x, dtype=float)
+        u = np.asarray(u, dtype=float)
+        w = np.clip(x[...,0], 2.5, 50)
+        Ia = x[...,1]
+        pitch = np.clip(x[...,2], np.deg2rad(0), np.deg2rad(90))
+        pitch_ref = u[...,0]
+        wind_speed = np.clip(u[...,1], 1.8, 25)
+
+        tip_speed_ratio = self.tip_speed_ratio(wind_speed, w)
+        [dpitchdt, d2pitchd2t] = self.pitch_actuator_ode_1st_order([pitch],[pitch_ref])
+        lambda_i = self.lambda_i(tip_speed_ratio, pitch)
+        if self.cp_table is None:
+            Cp = self.c_p(lambda_i,pitch)
+        else:
+            Cp = self.cp_table(tip_speed_ratio, pitch)
+        Tm = self.tm(Cp,wind_speed,w)
+        Ea = self.rotor.Ea(w)
+        if self.reduced_order:
+            Ia = self.rotor.Ia_qss(Ea)
+        Tem = self.rotor.tem(Ia)
+        power = self.rotor.power(Ia)
+
+        return {"Cp": Cp, "Lambda_i": lambda_i, "Labmda": tip_speed_ratio, "Tem": Tem, "Tm": Tm, "Ia": Ia, "Ea": Ea,
+                "w": w, "pitch": pitch, "dptich": dpitchdt, "pitch_ref": pitch_ref, "power": power}
     
+    #Analytic Jacobians of wind_turbine_ode. A = d(dxdt)/dx (...,4,4), B = d(dxdt)/du (...,4,2)
+    #Works for a single state (4,) or a batch (N,4). Saturated signals have zero derivative
+    def wind_turbine_jacobians(self,t,x,u):
+        x = np.asarray(x, dtype=float)
+        u = np.asarray(u, dtype=float)
+        w = np.clip(x[...,0], 2.5, 50)
+        Ia = x[...,1]
+        pitch = np.clip(x[...,2], np.deg2rad(0), np.deg2rad(90))
+        pitch_ref = u[...,0]
+        wind_speed = np.clip(u[...,1], 1.8, 25)
+        #Saturation gates
+        dw_sat = ((x[...,0] >= 2.5) & (x[...,0] <= 50)).astype(float)
+        dpitch_sat = ((x[...,2] >= np.deg2rad(0)) & (x[...,2] <= np.deg2rad(90))).astype(float)
+        dwind_sat = ((u[...,1] >= 1.8) & (u[...,1] <= 25)).astype(float)
+
+        tip_speed_ratio = self.tip_speed_ratio(wind_speed, w)
+        if self.cp_table is None:
+            lambda_i = self.lambda_i(tip_speed_ratio, pitch)
+            E = np.exp(-(self.c7/lambda_i))
+            Cp_B = self.c2/lambda_i - self.c3*pitch - self.c4*(pitch**self.c5) - self.c6
+            Cp_raw = self.c1*Cp_B*E
+            dCp_sat = ((Cp_raw >= 0.0) & (Cp_raw <= 1.0)).astype(float)
+            Cp = np.clip(Cp_raw, 0.0, 1.0)
+
+            #Chain rule through lambda_i(tip_speed_ratio, pitch) and c_p(lambda_i, pitch)
+            dCp_dlambda_i = self.c1*E/lambda_i**2*(self.c7*Cp_B - self.c2)
+            dlambda_i_dtsr = lambda_i**2/(tip_speed_ratio + self.c8)**2
+            dlambda_i_dpitch = -lambda_i**2*3*self.c9*pitch**2/(pitch**3 + 1)**2
+            dCp_dtsr = dCp_sat*dCp_dlambda_i*dlambda_i_dtsr
+            dCp_dpitch = dCp_sat*(dCp_dlambda_i*dlambda_i_dpitch + self.c1*E*(-self.c3 - self.c4*self.c5*pitch**(self.c5-1)))
+        else:
+            #Derivatives of the table interpolant the ODE uses
+            Cp, dCp_dtsr, dCp_dpitch = self.cp_table.gradient(tip_speed_ratio, pitch)
+        dCp_dw = dCp_dtsr*self.R/wind_speed
+        dCp_dwind = -dCp_dtsr*w*self.R/wind_speed**2
+
+        #Tm = Cp*k
+        k = self.rho*self.A*wind_speed**3/(2*w)
+        dTm_dw = dCp_dw*k - Cp*k/w
+        dTm_dpitch = dCp_dpitch*k
+        dTm_dwind = dCp_dwind*k + 3*Cp*k/wind_speed
+
+        rotor = self.rotor
+        KgKphi = rotor.KgKphi
+        rate_sat = (np.abs((pitch_ref - pitch)/self.tao_pitch) <= self.max_dpitch).astype(float)
+
+        A = np.zeros(x.shape + (4,))
+        B = np.zeros(x.shape[:-1] + (4,2))
+        A[...,0,2] = dpitch_sat*dTm_dpitch/rotor.J
+        A[...,2,2] = -dpitch_sat*rate_sat/self.tao_pitch
+        B[...,0,1] = dwind_sat*dTm_dwind/rotor.J
+        B[...,2,0] = rate_sat/self.tao_pitch
+        if self.reduced_order:
+            #Tem = Kg*Kphi*Ia_qss(w), the Ia row is the w row scaled by Kg*Kphi/(Ra+Rl)
+            A[...,0,0] = dw_sat*(dTm_dw - rotor.Kf - KgKphi**2/(rotor.Ra + rotor.Rl))/rotor.J
+            A[...,1,:] = dw_sat[...,None]*KgKphi/(rotor.Ra + rotor.Rl)*A[...,0,:]
+            B[...,1,:] = dw_sat[...,None]*KgKphi/(rotor.Ra + rotor.Rl)*B[...,0,:]
+        else:
+            A[...,0,0] = dw_sat*(dTm_dw - rotor.Kf)/rotor.J
+            A[...,0,1] = -KgKphi/rotor.J
+            A[...,1,0] = dw_sat*KgKphi/rotor.La
+            A[...,1,1] = -(rotor.Ra + rotor.Rl)/rotor.La
+        return A, B
+
+    #State Jacobian for implicit solvers (solve_ivp jac=)
+    def wind_turbine_jac(self,t,x,u):
+        A, B = self.wind_turbine_jacobians(t,x,u)
+        return A
+
+    #Rotor acceleration torque J*dw/dt with the current at its steady state (dIa/dt = 0). Vectorized
+    def steady_state_torque(self, w, wind_speed, pitch):
+        w = np.clip(w, 2.5, 50)
+        pitch = np.clip(pitch, np.deg2rad(0), np.deg2rad(90))
+        wind_speed = np.clip(wind_speed, 1.8, 25)
+        tip_speed_ratio = self.tip_speed_ratio(wind_speed, w)
+        if self.cp_table is None:
+            Cp = self.c_p(self.lambda_i(tip_speed_ratio, pitch),pitch)
+        else:
+            Cp = self.cp_table(tip_speed_ratio, pitch)
+        Tm = self.tm(Cp,wind_speed,w)
+        Tem = self.rotor.tem(self.rotor.Ia_qss(self.rotor.Ea(w)))
+        return Tm - Tem - self.rotor.Kf*w
+
+    #Equilibrium state (dw/dt = dIa/dt = dpitch/dt = 0) for arrays of wind speed and pitch (pitch_ref = pitch).
+    #Takes the highest stable rotor speed. Returns x (...,4). w saturates at 2.5 or 50 when there is no equilibrium
+    def trim(self, wind_speed, pitch, n_grid=128):
+        wind_speed, pitch = np.broadcast_arrays(np.asarray(wind_speed, dtype=float), np.asarray(pitch, dtype=float))
+        f = lambda w: self.steady_state_torque(w, wind_speed[...,None], pitch[...,None])
+        w_lo, w_hi, found, last_value = bracket_stable_root(f, 2.5, 50, n_grid, highest=True)
+        w = bisect_root(lambda w: self.steady_state_torque(w, wind_speed, pitch), w_lo, w_hi)
+        w = np.where(found, w, np.where(last_value > 0, 50.0, 2.5))
+        Ia = self.rotor.Ia_qss(self.rotor.Ea(w))
+        return np.stack([w, Ia, pitch, np.zeros_like(w)], axis=-1)
+
+    #Lowest pitch that holds the rotor speed w at equilibrium for arrays of wind speed. When no pitch can:
+    #NaN, or with saturate=True 0 (too little wind) and 90º (too much wind, no pitch authority left)
+    def trim_pitch(self, wind_speed, w, n_grid=128, saturate=False):
+        wind_speed, w = np.broadcast_arrays(np.asarray(wind_speed, dtype=float), np.asarray(w, dtype=float))
+        f = lambda pitch: self.steady_state_torque(w[...,None], wind_speed[...,None], pitch)
+        pitch_lo, pitch_hi, found, last_value = bracket_stable_root(f, np.deg2rad(0), np.deg2rad(90), n_grid, highest=False)
+        pitch = bisect_root(lambda pitch: self.steady_state_torque(w, wind_speed, pitch), pitch_lo, pitch_hi)
+        if saturate:
+            fallback = np.where(self.steady_state_torque(w, wind_speed, 0.0) <= 0, np.deg2rad(0), np.deg2rad(90))
+        else:
+            fallback = np.nan
+        return np.where(found, pitch, fallback)
+
+    #Stiff linear part of the dynamics (diagonal). The armature current decays with (Ra+Rl)/La
+    def linear_part(self):
+        if self.reduced_order:
+            return np.zeros(4)
+        return np.array([0.0, -self.rotor.R_La, 0.0, 0.0])
+
     #Mechanical torque. Eq 1
     def tm(self,Cp,v,w):
-        Tm = (Cp*self.rho*self.A*v**3)/(2*w)
+        Tm = Cp*self.half_rho_A*v**3/w
         return Tm
     
     #lambda_i: Part of Cp. Eq 2
@@ -174,40 +404,70 @@ class WindTurbineDynamics():
         pitch = x[0]
         d2pitchd2t = 0
 
-        tao=0.2 #time constant [s]
+        tao=self.tao_pitch #time constant [s]
         dpitchdt = 1/tao*(pitch_ref-pitch)
 
-        max_dptich = np.radians(5) #5º/s
+        max_dptich = self.max_dpitch #5º/s
         dpitchdt = np.clip(dpitchdt, -max_dptich, max_dptich)
 
         dxdt =  [dpitchdt, d2pitchd2t]
         return dxdt
 
     
+#Grid search of f (decreasing sign change, + to -) over [lo, hi] along the last axis.
+#f maps a grid (G,) to values (...,G). Returns the bracket (a, b), whether it exists and f at hi
+def bracket_stable_root(f, lo, hi, n_grid, highest=True):
+    grid = np.linspace(lo, hi, n_grid)
+    values = f(grid)
+    change = (values[...,:-1] > 0) & (values[...,1:] <= 0)
+    found = change.any(axis=-1)
+    if highest:
+        j = (n_grid - 2) - np.argmax(change[...,::-1], axis=-1)
+    else:
+        j = np.argmax(change, axis=-1)
+    return grid[j], grid[j+1], found, values[...,-1]
+
+#Vectorized bisection of f (f(a) > 0 >= f(b)) to machine precision
+def bisect_root(f, a, b, iterations=52):
+    for i in range(iterations):
+        mid = 0.5*(a + b)
+        positive = f(mid) > 0
+        a = np.where(positive, mid, a)
+        b = np.where(positive, b, mid)
+    return 0.5*(a + b)
+
+    
 class RotorDynamics():
-    def __init__(self):
+    def __init__(self, config=None):
         logging.info("Rotor dynamics initialized")
-        self.J = 6.53           #Rotor inertia [kg*m^2]
-        self.Kf = 0.025         #Friction constant [Nm*s/rad]
-        #self.Kf = 1            #Increasing friction to make it easier to control
-        self.Kg = 23.31 #*0.264 #generator constant []
-        self.Kphi = 0.264       #Magnetic flow coupling [V*s/rad]
-        self.La = 13.5*10**(-3) #Armature inductance [H]
-        self.Vnom = 240         #Nominal voltage [V]
-        self.Ra = 0.275         #Armature resistance [Ohm]
-        self.Rl = 8             #Load resistance [Ohm]
+        parameters = load_model_config(config)["Rotor"]
+        self.J = parameters["J"]            #Rotor inertia [kg*m^2]
+        self.Kf = parameters["Kf"]          #Friction constant [Nm*s/rad]
+        self.Kg = parameters["Kg"]          #generator constant []
+        self.Kphi = parameters["Kphi"]      #Magnetic flow coupling [V*s/rad]
+        self.La = parameters["La"]          #Armature inductance [H]
+        self.Vnom = parameters["Vnom"]      #Nominal voltage [V]
+        self.Ra = parameters["Ra"]          #Armature resistance [Ohm]
+        self.Rl = parameters["Rl"]          #Load resistance [Ohm]
+
+        #Derived constants of the hot path
+        self.KgKphi = self.Kg*self.Kphi
+        self.inv_J = 1/self.J
+        self.inv_La = 1/self.La
+        self.R_La = (self.Ra + self.Rl)/self.La
+        self.inv_R = 1/(self.Ra + self.Rl)
         
     #Rotor speed ode. Eq 6
     def w_ode(self,x,u):
         w = x[0]
         Tm = u[0]
         Tem = u[1]
-        dwdt = (Tm - Tem - self.Kf*w)/self.J
+        dwdt = (Tm - Tem - self.Kf*w)*self.inv_J
         return dwdt
     
     #Electrical torque [Nm]. Eq 7
     def tem(self,Ia):
-        Tem = self.Kg*self.Kphi*Ia
+        Tem = self.KgKphi*Ia
         return Tem
     
     #Electrical current ode. Eq 8
@@ -215,16 +475,21 @@ class RotorDynamics():
         Ia = x[0]
         Ea = u[0]
         #Rl*Ia = V
-        dIadt = (Ea - (self.Ra+self.Rl)*Ia)/self.La
+        dIadt = Ea*self.inv_La - self.R_La*Ia
 
         return dIadt
+
+    #Quasi steady state current (dIa/dt = 0)
+    def Ia_qss(self,Ea):
+        Ia = Ea*self.inv_R
+        return Ia
     
     def power(self,Ia):
-        V = np.clip(self.Rl*Ia, -240, 240)
+        V = np.clip(self.Rl*Ia, -self.Vnom, self.Vnom)
         power = V*Ia
         return power
 
     #Electrical back emf [V]. Eq 9
     def Ea(self,w):
-        Ea = self.Kg*self.Kphi*w
+        Ea = self.KgKphi*w
         return Ea
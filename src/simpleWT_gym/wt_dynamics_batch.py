@@ -0,0 +1,140 @@
+import logging
+
+import numpy as np
+
+from .integrators import make_integrator
+from .wt_dynamics import WindTurbineDynamics
+
+"""
+Batched N-turbine dynamics.
+State: (N,4) array [w, Ia, pitch, dpitch]
+Inputs: (N,2) array [pitch_ref, wind]
+Same equations as WindTurbineDynamics evaluated as array ops over the whole batch.
+"""
+class BatchWindTurbineDynamics(WindTurbineDynamics):
+    def __init__(self, n, reduced_order=False, cp_table=None, config=None):
+        super().__init__(reduced_order=reduced_order, cp_table=cp_table, config=config)
+        logging.info("Batched wind turbine dynamics initialized for {} turbines".format(n))
+        self.n = n
+        self.x0 = np.tile(np.array(self.x0, dtype=float), (n,1))
+
+        #Operating point of the logging signals per turbine
+        self.x_op = self.x0.copy()
+        self.u_op = np.zeros((n,2))
+        self.u_op[:,0] = self.x0[:,2]
+        self._outputs = None
+
+    @property
+    def pitch_ref(self):
+        return self.u_op[:,0]
+
+    #Accepted state and input of the selected turbines
+    def set_operating_point(self,x,u,idx=slice(None)):
+        self.x_op[idx] = x
+        self.u_op[idx] = u
+        self._outputs = None
+
+    # Wind turbine dynamics for the whole batch. x: (N,4), u: (N,2). Returns dxdt (N,4)
+    def wind_turbine_ode(self,t,x,u):
+        #State variables
+        w = x[:,0]
+        Ia = x[:,1]
+        pitch = x[:,2]
+        #inputs
+        pitch_ref = u[:,0]
+        wind_speed = u[:,1]
+
+        # Saturation tricks from Simulink to keep things in range
+        w = np.clip(w, 2.5, 50)
+        pitch = np.clip(pitch, np.deg2rad(0), np.deg2rad(90))
+        wind_speed = np.clip(wind_speed, 1.8, 25)
+
+        #Wind Turbine dynamics
+        tip_speed_ratio = self.tip_speed_ratio(wind_speed, w)
+        [dpitchdt, d2pitchd2t] = self.pitch_actuator_ode_1st_order([pitch],[pitch_ref])
+
+        if self.cp_table is None:
+            Cp = self.c_p(self.lambda_i(tip_speed_ratio, pitch),pitch)
+        else:
+            Cp = self.cp_table(tip_speed_ratio, pitch)
+        Tm = self.tm(Cp,wind_speed,w)
+        #Rotor dynamics
+        Ea = self.rotor.Ea(w)
+        if self.reduced_order:
+            #Singular perturbation. No electrical transient, Ia follows Ea
+            Ia = self.rotor.Ia_qss(Ea)
+        Tem = self.rotor.tem(Ia)
+        dwdt = self.rotor.w_ode([w],[Tm,Tem])
+        if self.reduced_order:
+            dIadt = self.rotor.Ia_qss(self.rotor.Ea(dwdt))*(w == x[:,0])
+        else:
+            dIadt = self.rotor.Ia_ode([Ia],[Ea])
+
+        #Return all ODEs derivatives
+        dxdt = np.empty_like(x)
+        dxdt[:,0] = dwdt
+        dxdt[:,1] = dIadt
+        dxdt[:,2] = dpitchdt
+        dxdt[:,3] = d2pitchd2t
+        return dxdt
+
+
+"""
+Batched simulator. Steps N turbines in lockstep with one batched RHS per integrator stage.
+Each turbine keeps its own time so finished ones can be reset independently.
+"""
+class BatchWindTurbineSimulator():
+    def __init__(self, n, integrator="RK4", reduced_order=False, cp_table=None, config=None):
+        logging.info("Batched wind turbine simulator initialized")
+        self.dt = 0.01           #Simulation time step [s]
+        self.n = n
+        self.wt = BatchWindTurbineDynamics(n, reduced_order=reduced_order, cp_table=cp_table, config=config)
+        self.x = self.wt.x0.copy()      #Initial state (N,4)
+        self.ti = np.zeros(n)           #Initial time per turbine
+        self.pitch_ref = self.x[:,2].copy() #Last commanded pitch per turbine
+        self.integrator = make_integrator(integrator, self.dt, model=self.wt)
+
+    #u: (N,2) [pitch_ref, wind]. idx selects a subset of turbines to advance (u then has one row per selected turbine)
+    def step(self, u, idx=slice(None)):
+        u = np.asarray(u, dtype=float)
+        #The model is autonomous, so every turbine integrates over [0,dt]
+        self.x[idx] = self.integrator.integrate(self.wt.wind_turbine_ode, 0.0, self.dt, self.x[idx], args=(u,))
+        self.pitch_ref[idx] = u[:,0]
+        self.wt.set_operating_point(self.x[idx], u, idx)
+        self.ti[idx] += self.dt
+        return self.x
+
+    #Equilibrium start for the selected turbines. wind (and pitch) has one value per selected turbine.
+    #With w, the pitch holding that rotor speed is used instead
+    def set_trim(self, wind, pitch=0.0, w=None, idx=slice(None)):
+        wind = np.asarray(wind, dtype=float)
+        if w is not None:
+            pitch = self.wt.trim_pitch(wind, w, saturate=True)
+        pitch = np.broadcast_to(np.asarray(pitch, dtype=float), wind.shape)
+        self.x[idx] = self.wt.trim(wind, pitch)
+        self.pitch_ref[idx] = pitch
+        self.wt.set_operating_point(self.x[idx], np.column_stack([pitch, wind]), idx)
+        self.integrator.reset()
+
+    #Snapshot of all turbines
+    def get_state(self):
+        return {
+            "x": self.x.copy(),
+            "ti": self.ti.copy(),
+            "pitch_ref": self.pitch_ref.copy(),
+            "u": self.wt.u_op.copy(),
+        }
+
+    def set_state(self, state):
+        self.x[:] = state["x"]
+        self.ti[:] = state["ti"]
+        self.pitch_ref[:] = state["pitch_ref"]
+        self.wt.set_operating_point(self.x, state["u"])
+        self.integrator.reset()
+
+    #Back to the initial state for the selected turbines
+    def reset(self, idx=slice(None)):
+        self.x[idx] = self.wt.x0[idx]
+        self.ti[idx] = 0.0
+        self.pitch_ref[idx] = self.wt.x0[idx,2]
+        self.wt.set_operating_point(self.x[idx], np.column_stack([self.pitch_ref[idx], self.wt.u_op[idx,1]]), idx)